@@ -0,0 +1,302 @@
+import os
+import json
+import math
+import asyncio
+import argparse
+from collections import defaultdict
+from time import perf_counter
+import httpx
+from bench.seed import BENCH_PASSWORD, WORDS, add_seed_arguments, seed
+
+# compared with the baseline: latencies may grow and throughput may drop by
+# this fraction before the run fails
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# the numbers a change is judged by, and whether higher is better. p99 is
+# reported only, a few hundred requests don't make it stable enough to gate on
+COMPARED_METRICS = {"p50_ms": False, "p95_ms": False, "rps": True}
+
+TASK_DATA = {
+    "title": "bench task",
+    "status": "todo",
+    "type": "dev",
+    "man_hour_min": 60,
+    "to_date": "2023-08-15T15:32:00",
+    "from_date": "2023-08-14T15:32:00",
+    "priority": "high",
+}
+
+
+class Recorder:
+    """
+    Latencies and failed requests of a run, by endpoint.
+    """
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def record(self, label: str, seconds: float, ok: bool):
+        self.latencies[label].append(seconds)
+        if not ok:
+            self.errors[label] += 1
+
+
+async def timed(client, recorder: Recorder, label: str, method: str, url: str, **kw):
+    start = perf_counter()
+    response = await client.request(method, url, **kw)
+    recorder.record(label, perf_counter() - start, response.status_code < 400)
+    return response
+
+
+async def virtual_user(client, recorder: Recorder, username: str, iterations: int):
+    """
+    Logs in as username, then runs the scenario iterations times: list tasks,
+    list projects with their tasks, search, create, update and delete a task.
+    The created tasks are deleted, the seeded data stays the same size.
+    """
+    response = await timed(
+        client,
+        recorder,
+        "POST /auth/login",
+        "POST",
+        "/auth/login",
+        json={"username": username, "password": BENCH_PASSWORD},
+    )
+    token = response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for i in range(iterations):
+        await timed(client, recorder, "GET /tasks", "GET", "/tasks", headers=headers)
+        response = await timed(
+            client,
+            recorder,
+            "GET /projects/tasks",
+            "GET",
+            "/projects/tasks",
+            headers=headers,
+        )
+        projects = response.json()
+        project_id = projects[i % len(projects)]["id"] if projects else None
+        await timed(
+            client,
+            recorder,
+            "GET /tasks/search",
+            "GET",
+            "/tasks/search",
+            params={"q": WORDS[i % len(WORDS)]},
+            headers=headers,
+        )
+
+        task = {**TASK_DATA, "project_id": project_id}
+        response = await timed(
+            client,
+            recorder,
+            "POST /tasks",
+            "POST",
+            "/tasks",
+            json=task,
+            headers=headers,
+        )
+        task_id = response.json()["id"]
+        await timed(
+            client,
+            recorder,
+            "PUT /tasks/{id}",
+            "PUT",
+            f"/tasks/{task_id}",
+            json={**task, "title": "bench task edited"},
+            headers=headers,
+        )
+        await timed(
+            client,
+            recorder,
+            "DELETE /tasks/{id}",
+            "DELETE",
+            f"/tasks/{task_id}",
+            headers=headers,
+        )
+
+
+def percentile(values: list[float], pct: float) -> float:
+    # nearest rank, always one of the measured values
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+    for label, latencies in recorder.latencies.items():
+        endpoints[label] = {
+            "requests": len(latencies),
+            "errors": recorder.errors[label],
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "rps": round(len(latencies) / elapsed, 2),
+        }
+    total = sum(len(latencies) for latencies in recorder.latencies.values())
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+async def run_benchmark(app, usernames: list, concurrency: int, iterations: int):
+    """
+    Runs concurrency virtual users at once through the ASGI app, in process,
+    so only the app and the database are measured, not a network.
+
+    Returns:
+        - dict: elapsed_s, rps and, per endpoint, requests, errors,
+          p50_ms/p95_ms/p99_ms and rps.
+    """
+    recorder = Recorder()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        started = perf_counter()
+        await asyncio.gather(
+            *(
+                virtual_user(
+                    client, recorder, usernames[i % len(usernames)], iterations
+                )
+                for i in range(concurrency)
+            )
+        )
+        elapsed = perf_counter() - started
+    return summarize(recorder, elapsed)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Returns a line per metric of an endpoint that is worse than in the
+    baseline by more than tolerance, empty when there's no regression.
+    """
+    regressions = []
+    for label, old in baseline["endpoints"].items():
+        new = results["endpoints"].get(label)
+        if new is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if not old.get(metric):
+                continue
+            change = new[metric] / old[metric] - 1
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(
+                    f"{label} {metric}: {old[metric]} -> {new[metric]} "
+                    f"({change:+.0%})"
+                )
+    return regressions
+
+
+def format_report(results: dict, baseline: dict | None = None) -> str:
+    header = f"{'endpoint':<22}{'reqs':>7}{'errs':>6}"
+    header += f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}"
+    if baseline:
+        header += f"{'p95 vs base':>13}{'req/s vs base':>15}"
+    lines = [header]
+    for label, row in sorted(results["endpoints"].items()):
+        line = f"{label:<22}{row['requests']:>7}{row['errors']:>6}"
+        line += f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}"
+        line += f"{row['rps']:>10}"
+        old = (baseline or {}).get("endpoints", {}).get(label)
+        if old:
+            line += f"{row['p95_ms'] / old['p95_ms'] - 1:>+13.0%}"
+            line += f"{row['rps'] / old['rps'] - 1:>+15.0%}"
+        lines.append(line)
+    lines.append(f"total: {results['rps']} req/s in {results['elapsed_s']}s")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the API in process")
+    parser.add_argument(
+        "--database",
+        help="database URI, defaults to SQLALCHEMY_DATABASE_URI or sqlite:///bench.db",
+    )
+    add_seed_arguments(parser)
+    parser.add_argument("--concurrency", type=int, default=10, help="virtual users")
+    parser.add_argument(
+        "--iterations", type=int, default=10, help="scenarios per virtual user"
+    )
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="store this run as the baseline"
+    )
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    # the app reads its settings when it's imported
+    os.environ["SQLALCHEMY_DATABASE_URI"] = (
+        args.database or os.getenv("SQLALCHEMY_DATABASE_URI") or "sqlite:///bench.db"
+    )
+    from main import app
+    from db import DB_ASYNC, engine
+    from migrations import run_migrations
+    from src.endpoints.auth import bcrypt_context
+    from src.utils.cache import CACHE_BACKEND
+
+    run_migrations(engine)
+    usernames = seed(
+        engine,
+        args.users,
+        args.projects,
+        args.tasks,
+        bcrypt_context.hash(BENCH_PASSWORD),
+    )
+
+    async def session():
+        await app.router.startup()
+        try:
+            return await run_benchmark(
+                app, usernames, args.concurrency, args.iterations
+            )
+        finally:
+            await app.router.shutdown()
+
+    results = asyncio.run(session())
+    # what the numbers depend on, runs are only comparable when it matches
+    results["config"] = {
+        "dialect": engine.dialect.name,
+        "db_async": DB_ASYNC,
+        "cache_backend": CACHE_BACKEND,
+        "users": args.users,
+        "projects": args.projects,
+        "tasks": args.tasks,
+        "concurrency": args.concurrency,
+        "iterations": args.iterations,
+    }
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    print(format_report(results, baseline))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2)
+        print("baseline saved to", args.baseline)
+        return 0
+    if baseline is None:
+        return 0
+
+    if baseline.get("config") != results["config"]:
+        print("warning: the baseline was run with", baseline.get("config"))
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print("regression:", regression)
+    return 1 if regressions else 0
+
+
+# Run `python -m bench.run --help` for the options
+if __name__ == "__main__":
+    raise SystemExit(main())
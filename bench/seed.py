@@ -0,0 +1,145 @@
+import uuid
+import random
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select
+
+# every benchmark user logs in with this password
+BENCH_PASSWORD = "bench-password"
+
+# words of task titles, so /tasks/search has prefixes and substrings to find
+WORDS = ["design", "review", "deploy", "meeting", "report", "fix", "plan", "test"]
+STATUSES = ["todo", "doing", "done"]
+PRIORITIES = ["low", "high", "urgent"]
+TYPES = ["mtg", "dev", "doc"]
+
+
+def bench_username(index: int, prefix: str = "bench") -> str:
+    return f"{prefix}-{index}"
+
+
+def seed(
+    bind,
+    users: int,
+    projects: int,
+    tasks: int,
+    password_hash: str,
+    prefix: str = "bench",
+) -> list:
+    """
+    Inserts the users {prefix}-0..{prefix}-{users - 1}, each with projects
+    projects of tasks tasks. Users that exist already are kept as they are,
+    so seeding the same database twice gives the same data.
+
+    The values come from a fixed random seed, the same arguments always give
+    the same titles, dates and statuses.
+
+    Parameters:
+        - bind (Engine): The engine of the database to seed, already migrated.
+        - password_hash (str): The stored hash of BENCH_PASSWORD.
+        - prefix (str): The start of the usernames, to seed separate sets.
+
+    Returns:
+        - list[str]: The usernames of all benchmark users.
+    """
+    # the app reads its settings on import, bench.run sets them first
+    from db import Project, Task, User
+    from src.utils.stats import rebuild_task_summaries
+
+    rng = random.Random(0)
+    start = datetime(2023, 1, 1)
+    usernames = [bench_username(index, prefix) for index in range(users)]
+
+    with bind.begin() as connection:
+        existing = set(
+            connection.execute(
+                select(User.username).where(User.username.in_(usernames))
+            ).scalars()
+        )
+        for username in usernames:
+            if username in existing:
+                continue
+            now = datetime.now()
+            user_id = str(uuid.uuid4())
+            connection.execute(
+                insert(User.__table__),
+                {
+                    "id": user_id,
+                    "username": username,
+                    "email": f"{username}@example.com",
+                    "password": password_hash,
+                    "created_at": now,
+                    "updated_at": now,
+                },
+            )
+
+            project_rows, task_rows = [], []
+            for p in range(projects):
+                project_id = str(uuid.uuid4())
+                from_date = start + timedelta(days=rng.randrange(365))
+                project_rows.append(
+                    {
+                        "id": project_id,
+                        "title": f"{rng.choice(WORDS)} project {p}",
+                        "status": rng.choice(STATUSES),
+                        "from_date": from_date,
+                        "to_date": from_date + timedelta(days=rng.randrange(1, 90)),
+                        "user_id": user_id,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                )
+                for t in range(tasks):
+                    task_from = from_date + timedelta(days=rng.randrange(60))
+                    task_rows.append(
+                        {
+                            "id": str(uuid.uuid4()),
+                            "title": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {t}",
+                            "status": rng.choice(STATUSES),
+                            "type": rng.choice(TYPES),
+                            "man_hour_min": rng.randrange(15, 480, 15),
+                            "from_date": task_from,
+                            "to_date": task_from + timedelta(days=rng.randrange(7)),
+                            "priority": rng.choice(PRIORITIES),
+                            "project_id": project_id,
+                            "user_id": user_id,
+                            "created_at": now,
+                            # distinct updated_at, as if edited over time
+                            "updated_at": now - timedelta(seconds=len(task_rows)),
+                        }
+                    )
+            if project_rows:
+                connection.execute(insert(Project.__table__), project_rows)
+            if task_rows:
+                connection.execute(insert(Task.__table__), task_rows)
+
+        # the summaries of /stats count the seeded tasks too
+        rebuild_task_summaries(connection)
+    return usernames
+
+
+def add_seed_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--users", type=int, default=10, help="users to seed")
+    parser.add_argument("--projects", type=int, default=5, help="projects per user")
+    parser.add_argument("--tasks", type=int, default=20, help="tasks per project")
+
+
+# Run `python -m bench.seed` to seed SQLALCHEMY_DATABASE_URI without benchmarking
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed benchmark users and tasks")
+    add_seed_arguments(parser)
+    args = parser.parse_args()
+
+    from db import engine
+    from migrations import run_migrations
+    from src.endpoints.auth import bcrypt_context
+
+    run_migrations(engine)
+    seed(
+        engine,
+        args.users,
+        args.projects,
+        args.tasks,
+        bcrypt_context.hash(BENCH_PASSWORD),
+    )
+    print(f"seeded {args.users} users")
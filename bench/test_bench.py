@@ -0,0 +1,38 @@
+import asyncio
+from bench.run import compare, percentile, run_benchmark
+from bench.seed import BENCH_PASSWORD, seed
+from db import engine
+from main import app
+from src.endpoints.auth import bcrypt_context
+
+
+def test_percentile():
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([3.0], 95) == 3
+
+
+def test_compare_flags_slower_and_lower_throughput():
+    baseline = {"endpoints": {"GET /tasks": {"p50_ms": 10, "p95_ms": 20, "rps": 100}}}
+    same = {"endpoints": {"GET /tasks": {"p50_ms": 11, "p95_ms": 21, "rps": 95}}}
+    assert compare(same, baseline, 0.25) == []
+
+    slower = {"endpoints": {"GET /tasks": {"p50_ms": 10, "p95_ms": 40, "rps": 50}}}
+    regressions = compare(slower, baseline, 0.25)
+    assert [line.split(":")[0] for line in regressions] == [
+        "GET /tasks p95_ms",
+        "GET /tasks rps",
+    ]
+
+
+def test_run_benchmark():
+    usernames = seed(engine, 2, 2, 3, bcrypt_context.hash(BENCH_PASSWORD))
+    # seeding again keeps the same users
+    assert seed(engine, 2, 2, 3, "unused") == usernames
+
+    results = asyncio.run(run_benchmark(app, usernames, 2, 1))
+    endpoints = results["endpoints"]
+    assert endpoints["POST /auth/login"]["requests"] == 2
+    assert endpoints["DELETE /tasks/{id}"]["requests"] == 2
+    assert all(row["errors"] == 0 for row in endpoints.values())
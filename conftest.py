@@ -0,0 +1,34 @@
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from starlette import status
+from db import engine
+from main import app
+from migrations import run_migrations
+
+client = TestClient(app)
+
+
+# the app migrates in its startup event, which TestClient only runs inside `with`
+@pytest.fixture(scope="session", autouse=True)
+def migrated_database():
+    run_migrations(engine)
+
+
+# registers a throwaway user, so tests don't depend on pre-seeded data
+@pytest.fixture
+def new_user_token():
+    username = "test-" + uuid.uuid4().hex
+    user_data = {"username": username, "email": "test@example.com", "password": "pw"}
+    response = client.post("/auth", json=user_data)
+    assert response.status_code == status.HTTP_200_OK
+    login_response = client.post(
+        "/auth/login", json={"username": username, "password": "pw"}
+    )
+    assert login_response.status_code == status.HTTP_200_OK
+    return login_response.json()["access_token"]
+
+
+@pytest.fixture
+def new_user_headers(new_user_token):
+    return {"Authorization": f"Bearer {new_user_token}"}
@@ -5,20 +5,256 @@ from sqlalchemy import (
     ForeignKey,
     DateTime,
     Column,
+    Index,
     Integer,
+    JSON,
     String,
     create_engine,
+    make_url,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
+from src.utils.pool import PoolStats, metered_pool_class, watch_pool_events
+from src.utils.profiling import watch_queries
+from src.utils.replicas import ReplicaRouter, create_write_marks
 
 load_dotenv()
 
 # SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI")
 SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URI)
+# true: endpoints use an AsyncSession on aiosqlite/asyncpg instead of the threadpool
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() == "true"
+
+# async driver used for each backend when DB_ASYNC is on
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def to_async_url(uri: str):
+    """
+    Swaps the driver of a database URI for its asyncio counterpart,
+    e.g. postgresql://... becomes postgresql+asyncpg://...
+    """
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+# comma-separated URIs of read replicas, read-only routes use them in turn
+SQLALCHEMY_REPLICA_URIS = [
+    uri.strip()
+    for uri in os.getenv("SQLALCHEMY_REPLICA_URIS", "").split(",")
+    if uri.strip()
+]
+# seconds a user's reads stay on the primary after they write, keep it above
+# the replication lag so users see their own writes
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+# seconds a replica whose connection failed gets no reads before it's checked again
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
+# queue: pool connections in each process
+# null: open a connection per checkout and leave pooling to PgBouncer/RDS Proxy,
+#       recommended for the Mangum/Lambda package
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# seconds to wait for a free connection before raising
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# seconds after which a connection is replaced, -1 keeps it forever
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# test connections on checkout so a failover doesn't hand out dead ones
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# stats of every engine's pool by name, served by GET /metrics/pool
+POOL_STATS: dict[str, PoolStats] = {}
+
+
+def engine_options(uri, name: str, is_async: bool = False) -> dict:
+    """
+    Builds the pool keyword arguments of create_engine from the DB_POOL_* variables.
+
+    Parameters:
+        - uri: The URI the engine connects to.
+        - name (str): The key of the pool in POOL_STATS.
+        - is_async (bool): Whether the options are for create_async_engine.
+
+    Returns:
+        - dict: Keyword arguments for create_engine/create_async_engine.
+    """
+    url = make_url(uri)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # an in-memory database lives in a single connection, keep the default pool
+        return {}
+
+    stats = POOL_STATS.setdefault(name, PoolStats())
+    if DB_POOL_MODE == "null":
+        options = {"poolclass": metered_pool_class(NullPool, stats)}
+        if url.get_driver_name() == "asyncpg":
+            # PgBouncer in transaction mode can't keep prepared statements
+            options["connect_args"] = {"statement_cache_size": 0}
+        return options
+
+    pool_class = AsyncAdaptedQueuePool if is_async else QueuePool
+    return {
+        "poolclass": metered_pool_class(pool_class, stats),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def make_engine(uri, name: str):
+    bound = create_engine(uri, **engine_options(uri, name))
+    if name in POOL_STATS:
+        watch_pool_events(bound, POOL_STATS[name])
+    watch_queries(bound)
+    return bound
+
+
+def make_async_engine(uri, name: str):
+    bound = create_async_engine(uri, **engine_options(uri, name, is_async=True))
+    if name in POOL_STATS:
+        watch_pool_events(bound.sync_engine, POOL_STATS[name])
+    watch_queries(bound.sync_engine)
+    return bound
+
+
+engine = make_engine(SQLALCHEMY_DATABASE_URI, "primary")
+
+# DB接続用のセッションクラス インスタンスが作成されると接続する
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+if DB_ASYNC:
+    async_engine = make_async_engine(
+        to_async_url(SQLALCHEMY_DATABASE_URI), "primary_async"
+    )
+    # objects stay loaded after commit, an AsyncSession can't lazy load them later
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+else:
+    async_engine = None
+    AsyncSessionLocal = None
+
+# engines of the mode of the sessions, AsyncEngines when DB_ASYNC is on
+if DB_ASYNC:
+    replica_engines = [
+        make_async_engine(to_async_url(uri), f"replica{index}_async")
+        for index, uri in enumerate(SQLALCHEMY_REPLICA_URIS)
+    ]
+else:
+    replica_engines = [
+        make_engine(uri, f"replica{index}")
+        for index, uri in enumerate(SQLALCHEMY_REPLICA_URIS)
+    ]
+
+replica_router = ReplicaRouter(
+    replica_engines,
+    create_write_marks(),
+    REPLICA_STICKY_SECONDS,
+    REPLICA_RETRY_SECONDS,
+)
+
+
+def pool_status() -> dict:
+    """
+    Returns the gauges and counters of each metered pool, by engine name.
+    """
+    engines = {"primary": engine}
+    if async_engine is not None:
+        engines["primary_async"] = async_engine.sync_engine
+    suffix = "_async" if DB_ASYNC else ""
+    for index, bound in enumerate(replica_engines):
+        engines[f"replica{index}{suffix}"] = getattr(bound, "sync_engine", bound)
+    return {
+        name: POOL_STATS[name].snapshot(bound.pool)
+        for name, bound in engines.items()
+        if name in POOL_STATS
+    }
+
+
+def create_session(bind=None):
+    """
+    Returns a new session of the configured mode, AsyncSession when DB_ASYNC is on.
+
+    Parameters:
+        - bind: The engine of a replica. Defaults to the primary.
+    """
+    factory = AsyncSessionLocal if DB_ASYNC else SessionLocal
+    return factory(bind=bind) if bind is not None else factory()
+
+
+async def create_read_session(user_id: str):
+    """
+    Returns a new session for read-only queries of the user, on the replica
+    chosen by replica_router or on the primary.
+    """
+    return create_session(await replica_router.choose(user_id))
+
+
+async def run_db(db_session, func, *args, **kwargs):
+    """
+    Runs func(session, *args, **kwargs) without blocking the event loop.
+
+    Query code is written once against the sync Session API. A sync session
+    runs it in the threadpool, an AsyncSession runs it on its async driver
+    through run_sync.
+    """
+    if isinstance(db_session, AsyncSession):
+        return await db_session.run_sync(func, *args, **kwargs)
+    return await run_in_threadpool(func, db_session, *args, **kwargs)
+
+
+async def stream_db(db_session, statement, batch_size: int):
+    """
+    Yields the rows of statement in lists of at most batch_size, fetched
+    from a server-side cursor, so memory doesn't grow with the result.
+    """
+    statement = statement.execution_options(yield_per=batch_size)
+    if isinstance(db_session, AsyncSession):
+        result = await db_session.stream(statement)
+        async for rows in result.partitions():
+            yield rows
+        return
+
+    result = await run_in_threadpool(db_session.execute, statement)
+    try:
+        while True:
+            rows = await run_in_threadpool(result.fetchmany, batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        result.close()
+
+
+async def close_session(db_session):
+    if isinstance(db_session, AsyncSession):
+        await db_session.close()
+    else:
+        await run_in_threadpool(db_session.close)
+
+
+# DB接続のセッションを各エンドポイントの関数に渡す
+async def get_db():
+    """
+    Dependency that opens a session for the routes that declare it.
+
+    The session only checks out a connection on its first query and is
+    closed even when the route raises, so requests that never reach the
+    database (CORS preflights, /docs, 401s) don't touch the pool.
+    """
+    db_session = create_session()
+    try:
+        yield db_session
+    finally:
+        await close_session(db_session)
 
 Base = declarative_base()
 
@@ -43,6 +279,13 @@ class Task(Base):
     project = relationship("Project", back_populates="tasks")
     user = relationship("User", back_populates="tasks")
 
+    # (user_id, updated_at, id) serves keyset pagination and any user_id lookup
+    __table_args__ = (
+        Index("ix_Task_user_id_updated_at_id", user_id, updated_at, id),
+        Index("ix_Task_user_id_title", user_id, title),
+        Index("ix_Task_project_id", project_id),
+    )
+
 
 # Each project can have multiple tasks
 class Project(Base):
@@ -60,12 +303,17 @@ class Project(Base):
     tasks = relationship("Task", back_populates="project")
     user = relationship("User", back_populates="projects")
 
+    # (user_id, updated_at, id) serves keyset pagination and any user_id lookup
+    __table_args__ = (
+        Index("ix_Project_user_id_updated_at_id", user_id, updated_at, id),
+    )
+
 
 # Each user can have multiple tasks and projects
 class User(Base):
     __tablename__ = "User"
     id = Column(String(36), primary_key=True, index=True)
-    username = Column(String(100), index=True)
+    username = Column(String(100), index=True, unique=True)
     email = Column(String(100))
     password = Column(String(100))
     created_at = Column(DateTime, default=datetime.now(), nullable=False)
@@ -76,8 +324,50 @@ class User(Base):
     projects = relationship("Project", back_populates="user")
 
 
-# Clear all tables
-# Base.metadata.drop_all(bind=engine)
+# Deleted tasks and projects, so /sync can tell clients what to remove
+class Tombstone(Base):
+    __tablename__ = "Tombstone"
+    id = Column(String(36), primary_key=True)
+    entity = Column(String(20), nullable=False)
+    entity_id = Column(String(36), nullable=False)
+    user_id = Column(String(), ForeignKey("User.id"))
+    deleted_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_Tombstone_user_id_deleted_at", user_id, deleted_at),
+        # the retention purge deletes by deleted_at across users
+        Index("ix_Tombstone_deleted_at", deleted_at),
+    )
+
+
+# Task count and man_hour_min per user and value of a dimension (project,
+# status, priority, type), updated by every task write when STATS_SUMMARY is on
+class TaskSummary(Base):
+    __tablename__ = "TaskSummary"
+    user_id = Column(String(36), primary_key=True)
+    dimension = Column(String(20), primary_key=True)
+    # "" stands for NULL, which can't be part of a primary key
+    value = Column(String(100), primary_key=True)
+    tasks = Column(Integer, nullable=False, default=0)
+    man_hour_min = Column(Integer, nullable=False, default=0)
+
+
+# Progress of a file import of tasks, rows_processed is committed with each
+# batch of rows so an interrupted import resumes after it
+class ImportJob(Base):
+    __tablename__ = "ImportJob"
+    id = Column(String(36), primary_key=True)
+    user_id = Column(String(), ForeignKey("User.id"), index=True)
+    filename = Column(String(200))
+    format = Column(String(10), nullable=False)
+    status = Column(String(20), nullable=False)
+    rows_processed = Column(Integer, nullable=False, default=0)
+    rows_imported = Column(Integer, nullable=False, default=0)
+    rows_failed = Column(Integer, nullable=False, default=0)
+    # the first IMPORT_MAX_ERRORS errors, [{"row": 3, "error": "..."}]
+    errors = Column(JSON, nullable=False, default=list)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
+# Tables and indexes are created by the versioned runner in migrations.py
@@ -0,0 +1,89 @@
+import os
+import json
+import time
+from importlib import import_module
+
+# the cold start report splits the init from the start of this import
+_started = time.perf_counter()
+
+# a container serves one request at a time, one pooled connection is enough.
+# Migrations run as a deploy step (`python migrations.py`), not on cold starts
+os.environ.setdefault("DB_POOL_SIZE", "1")
+os.environ.setdefault("RUN_MIGRATIONS", "false")
+
+# imported one layer at a time, each is timed apart
+import_module("fastapi")
+from mangum import Mangum  # noqa: E402
+
+_framework_imported = time.perf_counter()
+
+import_module("db")
+
+_db_imported = time.perf_counter()
+
+from main import create_app  # noqa: E402
+from routes.api import ROUTERS, load_router  # noqa: E402
+
+_app_imported = time.perf_counter()
+
+# built once per container, warm invocations reuse the app, the engine and the
+# connection in its pool (checked by DB_POOL_PRE_PING after the container thaws).
+# lifespan off: there is no shutdown to dispose on, and no change feed to start
+app = create_app(include_routers=False)
+asgi_handler = Mangum(app, lifespan="off")
+
+_initialized = time.perf_counter()
+
+
+def _ms(start: float, end: float) -> float:
+    return round((end - start) * 1000, 1)
+
+
+# milliseconds of each step of the cold start, printed by the first invocation
+cold_start = {
+    "import_framework_ms": _ms(_started, _framework_imported),
+    "import_db_ms": _ms(_framework_imported, _db_imported),
+    "import_app_ms": _ms(_db_imported, _app_imported),
+    "create_app_ms": _ms(_app_imported, _initialized),
+}
+
+# path prefixes whose router is included in app
+included: set[str] = set()
+
+
+def request_path(event: dict) -> str:
+    # HTTP API (v2) and function URLs send rawPath, REST API (v1) and ALB send path
+    return event.get("rawPath") or event.get("path") or "/"
+
+
+def include_routers_for(path: str):
+    """
+    Imports and includes the router serving path on its first request, so a
+    cold start only loads the endpoint modules it needs. /docs, /openapi.json
+    and paths of no router need every router, for the schema or the 404.
+    """
+    prefix = path.strip("/").split("/", 1)[0]
+    for name in [prefix] if prefix in ROUTERS else ROUTERS:
+        if name not in included:
+            app.include_router(load_router(name))
+            included.add(name)
+
+
+def handler(event, context):
+    """
+    Entry point of the Lambda function (`lambda_handler.handler`).
+    """
+    global cold_start
+    start = time.perf_counter()
+    include_routers_for(request_path(event))
+    routed = time.perf_counter()
+    response = asgi_handler(event, context)
+
+    if cold_start is not None:
+        cold_start["routers_ms"] = _ms(start, routed)
+        # includes opening the first database connection
+        cold_start["first_request_ms"] = _ms(routed, time.perf_counter())
+        cold_start["total_ms"] = _ms(_started, time.perf_counter())
+        print(json.dumps({"cold_start": cold_start}))
+        cold_start = None
+    return response
@@ -0,0 +1,155 @@
+from datetime import datetime
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    inspect,
+    select,
+    text,
+)
+from db import (
+    Base,
+    ImportJob,
+    Project,
+    Task,
+    TaskSummary,
+    Tombstone,
+    User,
+    engine,
+)
+from src.utils.periods import create_period_index
+from src.utils.search import create_search_index
+from src.utils.stats import rebuild_task_summaries
+
+# Applied versions are recorded here, outside of Base so create_all ignores it
+metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# arbitrary key of the Postgres advisory lock held while migrating
+MIGRATION_LOCK_ID = 72_271_001
+
+MIGRATIONS = []
+
+
+def migration(version: int, description: str):
+    """
+    Registers a function(connection) as the migration to the given version.
+    Migrations run once each, in version order, inside one transaction.
+    """
+
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        return func
+
+    return register
+
+
+def create_indexes(connection, *models):
+    # checkfirst skips indexes that a previous create_all already made
+    for model in models:
+        for index in model.__table__.indexes:
+            index.create(connection, checkfirst=True)
+
+
+@migration(1, "create tables")
+def create_tables(connection):
+    # Databases created before this runner already have the tables,
+    # create_all only adds the missing ones
+    Base.metadata.create_all(connection)
+
+
+@migration(2, "index user_id, project_id and title, make username unique")
+def add_indexes(connection):
+    # ix_User_username used to be a plain index, rebuild it as a unique one
+    for index in inspect(connection).get_indexes(User.__tablename__):
+        if index["name"] == "ix_User_username" and not index["unique"]:
+            connection.execute(text('DROP INDEX "ix_User_username"'))
+    create_indexes(connection, User, Project, Task)
+
+
+@migration(3, "task title search index")
+def add_search_index(connection):
+    create_search_index(connection)
+
+
+@migration(4, "tombstones of deleted tasks and projects")
+def add_tombstones(connection):
+    Tombstone.__table__.create(connection, checkfirst=True)
+
+
+@migration(5, "progress of task imports")
+def add_import_jobs(connection):
+    ImportJob.__table__.create(connection, checkfirst=True)
+
+
+@migration(6, "task summaries of /stats")
+def add_task_summaries(connection):
+    TaskSummary.__table__.create(connection, checkfirst=True)
+    rebuild_task_summaries(connection)
+
+
+@migration(7, "index the from_date..to_date periods of tasks")
+def add_period_index(connection):
+    create_period_index(connection)
+
+
+@migration(8, "key the SQLite task search index by task id")
+def rekey_search_index(connection):
+    # the FTS5 table used to read titles by the implicit rowid of Task
+    create_search_index(connection)
+
+
+@migration(9, "index deleted_at of tombstones for the retention purge")
+def add_tombstone_purge_index(connection):
+    create_indexes(connection, Tombstone)
+
+
+def get_applied_versions(connection) -> set[int]:
+    return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def run_migrations(bind=engine) -> list[int]:
+    """
+    Applies the migrations that the database has not recorded yet.
+
+    Parameters:
+        - bind (Engine): The engine of the database to migrate.
+
+    Returns:
+        - list[int]: The versions applied by this call.
+    """
+    applied = []
+    with bind.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            # keep workers that start at the same time from migrating twice
+            connection.execute(
+                text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID}
+            )
+        metadata.create_all(connection)
+        done = get_applied_versions(connection)
+
+        for version, description, func in sorted(MIGRATIONS, key=lambda m: m[0]):
+            if version in done:
+                continue
+            func(connection)
+            connection.execute(
+                schema_migrations.insert().values(
+                    version=version, description=description, applied_at=datetime.now()
+                )
+            )
+            applied.append(version)
+    return applied
+
+
+# Run `python migrations.py` to migrate without starting the app
+if __name__ == "__main__":
+    print("applied migrations:", run_migrations() or "none")
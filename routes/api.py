@@ -1,9 +1,32 @@
+from importlib import import_module
 from fastapi import APIRouter
-from src.endpoints import auth, task, project
 
-router = APIRouter()
-router.include_router(task.router)
-router.include_router(project.router)
-router.include_router(auth.router)
+# first segment of the path -> module under src/endpoints that serves it
+ROUTERS = {
+    "tasks": "task",
+    "projects": "project",
+    "auth": "auth",
+    "metrics": "metrics",
+    "sync": "sync",
+    "events": "events",
+    "export": "export",
+    "imports": "imports",
+    "stats": "stats",
+}
+
+
+def load_router(prefix: str) -> APIRouter:
+    """
+    Imports the endpoint module of a path prefix and returns its router, so
+    an app can include only the routers it gets requests for.
+    """
+    return import_module(f"src.endpoints.{ROUTERS[prefix]}").router
+
+
+def build_router() -> APIRouter:
+    router = APIRouter()
+    for prefix in ROUTERS:
+        router.include_router(load_router(prefix))
+    return router
 
 # This file calls every apis under src/endpoints
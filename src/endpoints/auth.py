@@ -7,10 +7,14 @@ from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from typing import Annotated
-from starlette.requests import Request
 from starlette import status
 from pydantic import BaseModel, Field
-from db import User
+from db import User, close_session, create_read_session, replica_router, run_db, get_db
+from src.utils.hashing import PasswordHasher
+from src.utils.persist import save, update_returning
+from src.utils.serialization import FastJSONResponse, list_response, model_columns
+from src.utils.token_cache import TokenCache
+from src.types.auth import UserGetResponse
 from passlib.context import CryptContext
 from dotenv import load_dotenv
 
@@ -22,6 +26,7 @@ router = APIRouter(
     prefix="/auth",
     tags=["Auth"],
     responses={404: {"description": "Not found"}},
+    default_response_class=FastJSONResponse,
 )
 
 
@@ -29,10 +34,28 @@ router = APIRouter(
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
-
-
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# verified tokens kept in memory, and for how many seconds at most (0 disables)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+# bcrypt cost, hashes made with another cost are replaced on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# threads that hash passwords, and hashes allowed to wait for one before 503
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+
+
+bcrypt_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+password_hasher = PasswordHasher(
+    bcrypt_context, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE
+)
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="auth/login")
+token_cache = TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
 
 
 class LoginRequest(BaseModel):
@@ -67,9 +90,38 @@ def get_user_by_username(db_session: Session, username: str):
     return db_session.query(User).filter(User.username == username).first()
 
 
-# DB接続のセッションを各エンドポイントの関数に渡す
-def get_db(request: Request):
-    return request.state.db
+# same as get_user, without blocking the event loop
+async def get_user_async(db_session, user_id: str):
+    return await run_db(db_session, get_user, user_id)
+
+
+async def get_user_by_username_async(db_session, username: str):
+    return await run_db(db_session, get_user_by_username, username)
+
+
+def list_users(db_session: Session):
+    return db_session.query(*model_columns(UserGetResponse, User)).all()
+
+
+# utility func to insert a user and return it as stored
+def save_user(db_session: Session, user: User):
+    return save(db_session, user)
+
+
+# utility func to overwrite a user, returns None when it doesn't exist
+def edit_user(db_session: Session, user_id: str, values: dict):
+    return update_returning(db_session, User, [User.id == user_id], values)
+
+
+# utility func to delete a user, returns False when it doesn't exist
+def remove_user(db_session: Session, user_id: str):
+    user = get_user(db_session, user_id)
+    if not user:
+        return False
+
+    db_session.delete(user)
+    db_session.commit()
+    return True
 
 
 @router.post("/login", response_model=Token)
@@ -79,7 +131,7 @@ async def login(
 ):
     # get current user and make sure entered password
     # and hashed password on DB are matched
-    user = authenticate_user(request.username, request.password, db)
+    user = await authenticate_user(request.username, request.password, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -96,16 +148,21 @@ async def login(
     return {"access_token": token, "token_type": "bearer", "user_id": user.id}
 
 
-def authenticate_user(username: str, password: str, db: Session):
+async def authenticate_user(username: str, password: str, db: Session):
     # get current user
-    user = get_user_by_username(db, username)
+    user = await get_user_by_username_async(db, username)
 
     if not user:
         return False
     # password is hashed and checked if match
-    if not bcrypt_context.verify(password, user.password):
+    valid, new_hash = await password_hasher.verify_and_update(password, user.password)
+    if not valid:
         return False
 
+    # the hash was made with an old BCRYPT_ROUNDS, store one with the current cost
+    if new_hash:
+        user = await run_db(db, edit_user, user.id, {"password": new_hash})
+
     return user
 
 
@@ -119,9 +176,19 @@ def create_access_token(
     return encoded_jwt
 
 
-# This func is called by all APIs
-# to authenticate user and get current user info
-async def get_current_user(token: str = Depends(oauth2_bearer)):
+# transform access token to user info, raises 401 when it's invalid
+def verify_token(token: str):
+    # the signature of a cached token was checked already
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+
+    if token_cache.is_revoked(token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token revoked",
+        )
+
     try:
         # transform access token to payload with username and id
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -142,7 +209,9 @@ async def get_current_user(token: str = Depends(oauth2_bearer)):
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials",
             )
-        return {"username": username, "id": user_id, "email": email}
+        user = {"username": username, "id": user_id, "email": email}
+        token_cache.put(token, user, expire)
+        return user
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -150,24 +219,55 @@ async def get_current_user(token: str = Depends(oauth2_bearer)):
         )
 
 
+# This func is called by all APIs
+# to authenticate user and get current user info
+async def get_current_user(token: str = Depends(oauth2_bearer)):
+    return verify_token(token)
+
+
+# DB接続のセッションを読み取り専用のエンドポイントに渡す
+async def get_read_db(current_user=Depends(get_current_user)):
+    """
+    Dependency of read-only routes: a session on a read replica when
+    SQLALCHEMY_REPLICA_URIS is set, else like get_db.
+
+    Users who wrote in the last REPLICA_STICKY_SECONDS read from the primary.
+    """
+    db_session = await create_read_session(current_user["id"])
+    try:
+        yield db_session
+    finally:
+        await close_session(db_session)
+
+
+# revoke the token of the request, it's refused from now until it expires
+@router.post("/logout")
+async def logout(token: str = Depends(oauth2_bearer)):
+    verify_token(token)
+    # the claims were just verified, read exp without checking the signature again
+    expire = jwt.get_unverified_claims(token)["exp"]
+    token_cache.revoke(token, expire)
+    return {"status": "OK"}
+
+
 # userの全取得
-@router.get("")
-def get_users(
-    db: Session = Depends(get_db),
+@router.get("", response_model=list[UserGetResponse])
+async def get_users(
+    db: Session = Depends(get_read_db),
     current_user=Depends(get_current_user),
 ):
-    users = db.query(User).all()
-    return users
+    users = await run_db(db, list_users)
+    return list_response(UserGetResponse, users)
 
 
 # 単一のuserを取得
 @router.get("/{user_id}")
-def get_user_by_id(
+async def get_user_by_id(
     user_id: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user=Depends(get_current_user),
 ):
-    user = get_user(db, user_id)
+    user = await get_user_async(db, user_id)
     return user
 
 
@@ -179,16 +279,14 @@ async def create_user(user_created: CreateUserRequest, db: Session = Depends(get
     user = User(
         username=user_created.username,
         email=user_created.email,
-        password=bcrypt_context.hash(user_created.password),  # hash password
+        # hash password
+        password=await password_hasher.hash(user_created.password),
     )
     user.id = str(uuid.uuid4())
     user.created_at = now
     user.updated_at = now
 
-    db.add(user)
-    db.commit()
-    user = get_user(db, user.id)
-    return user
+    return await run_db(db, save_user, user)
 
 
 # userを更新
@@ -201,22 +299,22 @@ async def update_user(
 ):
     now = datetime.now()
 
-    user = get_user(db, user_id)
+    password = await password_hasher.hash(user_created.password)
+    user = await run_db(
+        db,
+        edit_user,
+        user_id,
+        {
+            "username": user_created.username,
+            "email": user_created.email,
+            "password": password,
+            "updated_at": now,
+        },
+    )
 
     if not user:
         return {"error": "user not found"}, 404
-
-    user.username = user_created.username
-    user.email = user_created.email
-    user.password = bcrypt_context.hash(user_created.password)
-    user.from_date = user_created.from_date
-    user.to_date = user_created.to_date
-
-    user.updated_at = now
-
-    db.commit()
-    # return user that is committed already
-    user = get_user(db, user_id)
+    await replica_router.wrote(current_user["id"])
     return user
 
 
@@ -227,10 +325,6 @@ async def delete_user(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
-    user = get_user(db, user_id)
-
-    if not user:
+    if not await run_db(db, remove_user, user_id):
         return {"error": "user not found"}, 404
-
-    db.delete(user)
-    db.commit()
+    await replica_router.wrote(current_user["id"])
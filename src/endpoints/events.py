@@ -0,0 +1,116 @@
+import os
+import json
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket
+from fastapi.responses import StreamingResponse
+from fastapi.security import OAuth2PasswordBearer
+from starlette import status
+from src.endpoints.auth import verify_token
+from src.utils.events import TooManyStreams, broker
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# seconds between heartbeats of an idle stream, below the idle timeout of proxies
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+HEARTBEAT_EVENT = {"entity": None, "op": "heartbeat", "ids": [], "at": None}
+
+# EventSource can't send headers, streams also take the token as ?token=
+optional_bearer = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+# APIRouter creates path operations for item module
+router = APIRouter(
+    prefix="/events",
+    tags=["Events"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+def check_capacity(user_id: str):
+    if not broker.can_subscribe(user_id):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many open event streams",
+        )
+
+
+async def sse_stream(user_id: str):
+    # subscribed once streaming starts, so the finally clause always runs
+    try:
+        subscription = broker.subscribe(user_id)
+    except TooManyStreams:
+        return
+    try:
+        # EventSource reconnects after this many ms, then resyncs with /sync
+        yield "retry: 5000\n\n"
+        while True:
+            event = await subscription.get(EVENTS_HEARTBEAT_SECONDS)
+            if event is None:
+                yield ": heartbeat\n\n"
+            else:
+                yield f"data: {json.dumps(event)}\n\n"
+    finally:
+        broker.unsubscribe(subscription)
+
+
+# taskとprojectの変更をServer-Sent Eventsで配信
+@router.get("")
+async def stream_events(
+    token: str = Query(None, title="token"),
+    bearer: str = Depends(optional_bearer),
+):
+    """
+    Streams the current user's task and project mutations as Server-Sent Events.
+
+    Parameters:
+        - token (str): The access token, for clients that can't send an
+          Authorization header. Defaults to None.
+
+    Returns:
+        - text/event-stream: One `data:` line per event, JSON of
+          {entity, op, ids, at}. op "resync" means events were dropped because
+          the client read too slowly, it should call /sync.
+    """
+    user = verify_token(token or bearer or "")
+    check_capacity(user["id"])
+    return StreamingResponse(
+        sse_stream(user["id"]),
+        media_type="text/event-stream",
+        # keep proxies from caching or buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# taskとprojectの変更をWebSocketで配信
+@router.websocket("/ws")
+async def websocket_events(websocket: WebSocket, token: str = Query(None)):
+    """
+    Sends the same events as GET /events as JSON messages, plus a heartbeat
+    message when the stream is idle. Messages from the client are ignored.
+    """
+    try:
+        user = verify_token(token or "")
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if not broker.can_subscribe(user["id"]):
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    await websocket.accept()
+    subscription = broker.subscribe(user["id"])
+
+    async def send_events():
+        while True:
+            event = await subscription.get(EVENTS_HEARTBEAT_SECONDS)
+            await websocket.send_json(event or HEARTBEAT_EVENT)
+
+    sender = asyncio.create_task(send_events())
+    try:
+        # returns when the client disconnects
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        sender.cancel()
+        broker.unsubscribe(subscription)
@@ -0,0 +1,274 @@
+import os
+import io
+import csv
+import uuid
+from datetime import datetime
+from itertools import islice
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+from starlette import status
+from starlette.concurrency import run_in_threadpool
+from db import ImportJob, Task, replica_router, run_db, get_db
+from src.endpoints.auth import get_current_user
+from src.utils.cache import response_cache
+from src.utils.events import broker
+from src.utils.persist import save
+from src.utils.stats import apply_task_changes
+from src.types.task import TaskCreateRequest
+from src.types.imports import ImportJobResponse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# rows validated and inserted per transaction
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+# errors kept in a job, the others are only counted
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))
+
+# APIRouter creates path operations for item module
+router = APIRouter(
+    prefix="/imports",
+    tags=["Import"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+class ImportConflict(Exception):
+    pass
+
+
+# utility func to get an import job of the user
+def get_import_job(db_session: Session, user_id: str, job_id: str):
+    return (
+        db_session.query(ImportJob)
+        .filter(ImportJob.id == job_id, ImportJob.user_id == user_id)
+        .first()
+    )
+
+
+# utility func to insert a job and return it as stored
+def save_import_job(db_session: Session, job: ImportJob):
+    return save(db_session, job)
+
+
+# utility func to insert the valid rows of a batch and move the progress of
+# the job past it in one transaction, fails if another request moved it first
+def save_import_batch(
+    db_session: Session, job_id: str, processed: int, rows: list, progress: dict
+):
+    if rows:
+        # Core executemany, the rows are complete so the ORM has nothing to add
+        db_session.execute(insert(Task.__table__), rows)
+        apply_task_changes(db_session, [], rows)
+    result = db_session.execute(
+        update(ImportJob)
+        .where(ImportJob.id == job_id, ImportJob.rows_processed == processed)
+        .values(**progress, updated_at=datetime.now()),
+        execution_options={"synchronize_session": False},
+    )
+    if result.rowcount != 1:
+        db_session.rollback()
+        raise ImportConflict(job_id)
+    db_session.commit()
+
+
+# utility func to set the status of a job, returns it as stored
+def finish_import_job(db_session: Session, job_id: str, job_status: str):
+    db_session.execute(
+        update(ImportJob)
+        .where(ImportJob.id == job_id)
+        .values(status=job_status, updated_at=datetime.now()),
+        execution_options={"synchronize_session": False},
+    )
+    db_session.commit()
+    return db_session.get(ImportJob, job_id, populate_existing=True)
+
+
+def read_rows(text, format: str):
+    """
+    Yields the data rows of an upload one at a time: the raw lines of
+    NDJSON, the dicts of CSV without empty cells (missing values).
+    """
+    if format == "csv":
+        for row in csv.DictReader(text):
+            yield {key: value for key, value in row.items() if key and value != ""}
+    else:
+        for line in text:
+            if line.strip():
+                yield line
+
+
+def describe_error(exc: ValidationError) -> str:
+    # loc is empty for a line that isn't JSON
+    return "; ".join(
+        ": ".join(filter(None, [".".join(map(str, error["loc"])), error["msg"]]))
+        for error in exc.errors()
+    )
+
+
+def skip_rows(rows, count: int):
+    next(islice(rows, count, count), None)
+
+
+def parse_batch(rows, first_row: int, size: int, user_id: str):
+    """
+    Validates the next size rows against TaskCreateRequest.
+
+    Returns:
+        - (list[dict], list[dict], int): The Task rows to insert, the errors
+          of the invalid rows and the number of rows read.
+    """
+    now = datetime.now()
+    tasks, errors, count = [], [], 0
+    for count, row in enumerate(islice(rows, size), start=1):
+        try:
+            if isinstance(row, str):
+                task = TaskCreateRequest.model_validate_json(row)
+            else:
+                task = TaskCreateRequest.model_validate(row)
+        except ValidationError as exc:
+            errors.append({"row": first_row + count, "error": describe_error(exc)})
+            continue
+        tasks.append(
+            {
+                **task.model_dump(exclude={"user_id"}),
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+    return tasks, errors, count
+
+
+# ファイルからtaskを一括登録
+@router.post("", response_model=ImportJobResponse)
+async def import_tasks(
+    file: UploadFile,
+    format: Literal["ndjson", "csv"] = Query(None, title="format"),
+    job_id: str = Query(None, title="job_id"),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Creates tasks from an NDJSON or CSV file, whose rows have the fields of
+    TaskCreateRequest (CSV: one column per field, with a header row).
+
+    The file is read and validated IMPORT_BATCH_SIZE rows at a time, each
+    batch is committed with the progress of the job. Invalid rows are
+    skipped and reported, GET /imports/{job_id} shows the progress while
+    the import runs.
+
+    Parameters:
+        - file: The file to import.
+        - format (str): "ndjson" or "csv". Defaults to csv for *.csv files.
+        - job_id (str): The job of an interrupted import of the same file,
+          to resume after its last committed row. Defaults to None.
+
+    Returns:
+        - ImportJobResponse: The job once the whole file is imported.
+    """
+    user_id = current_user["id"]
+    if job_id:
+        job = await run_db(db, get_import_job, user_id, job_id)
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found"
+            )
+        if job.status == "done":
+            return job
+        format = job.format
+    else:
+        if format is None:
+            csv_file = (file.filename or "").lower().endswith(".csv")
+            format = "csv" if csv_file else "ndjson"
+        now = datetime.now()
+        job = ImportJob(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            filename=file.filename,
+            format=format,
+            status="running",
+            rows_processed=0,
+            rows_imported=0,
+            rows_failed=0,
+            errors=[],
+            created_at=now,
+            updated_at=now,
+        )
+        job = await run_db(db, save_import_job, job)
+
+    job_id = job.id
+    processed = job.rows_processed
+    progress = {
+        "status": "running",
+        "rows_imported": job.rows_imported,
+        "rows_failed": job.rows_failed,
+        "errors": list(job.errors),
+    }
+
+    # the upload is spooled to disk by Starlette, it's read one line at a time
+    text = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    rows = read_rows(text, format)
+    imported = False
+    try:
+        # rows committed by the interrupted run
+        await run_in_threadpool(skip_rows, rows, processed)
+        while True:
+            tasks, errors, count = await run_in_threadpool(
+                parse_batch, rows, processed, IMPORT_BATCH_SIZE, user_id
+            )
+            if count == 0:
+                break
+            progress["rows_imported"] += len(tasks)
+            progress["rows_failed"] += len(errors)
+            room = max(IMPORT_MAX_ERRORS - len(progress["errors"]), 0)
+            progress["errors"] += errors[:room]
+            await run_db(
+                db,
+                save_import_batch,
+                job_id,
+                processed,
+                tasks,
+                {**progress, "rows_processed": processed + count},
+            )
+            processed += count
+            imported = imported or bool(tasks)
+    except ImportConflict:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The import job is being resumed by another request",
+        )
+    except (UnicodeDecodeError, csv.Error) as exc:
+        # the rows before the unreadable line stay imported
+        await run_db(db, finish_import_job, job_id, "failed")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unreadable file: {exc}"
+        )
+    finally:
+        # don't let the wrapper close the upload
+        text.detach()
+        if imported:
+            await response_cache.invalidate(user_id, "tasks", "projects")
+            await replica_router.wrote(user_id)
+            broker.publish(user_id, "task", "imported", [job_id])
+
+    return await run_db(db, finish_import_job, job_id, "done")
+
+
+# importの進捗を取得 (進行中のimportが書き込むのでprimaryから読む)
+@router.get("/{job_id}", response_model=ImportJobResponse)
+async def get_import(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    job = await run_db(db, get_import_job, current_user["id"], job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found"
+        )
+    return job
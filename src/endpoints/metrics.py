@@ -0,0 +1,80 @@
+import os
+import hmac
+from fastapi import APIRouter, Depends, Header, HTTPException
+from starlette import status
+from db import pool_status, replica_router
+from src.endpoints.auth import password_hasher, token_cache
+from src.utils.cache import response_cache
+from src.utils.events import broker
+from src.utils.profiling import route_stats
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# /metrics answers only requests sent with `Authorization: Bearer <token>`,
+# and 404 while it's unset
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
+def check_metrics_token(authorization: str = Header(None)):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    expected = f"Bearer {METRICS_TOKEN}".encode()
+    if not hmac.compare_digest((authorization or "").encode(), expected):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+# APIRouter creates path operations for item module
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Metrics"],
+    dependencies=[Depends(check_metrics_token)],
+    responses={404: {"description": "Not found"}},
+)
+
+
+# connection pool usage, to size DB_POOL_SIZE/DB_MAX_OVERFLOW from data
+@router.get("/pool")
+def get_pool_metrics():
+    """
+    Returns, for each engine, the checked-out, idle and overflow connections
+    and the average/max time requests waited for a connection.
+    """
+    return pool_status()
+
+
+# hit ratio of the verified token cache and saturation of the password hash pool
+@router.get("/auth")
+def get_auth_metrics():
+    return {
+        "token_cache": token_cache.stats(),
+        "password_hash": password_hasher.stats(),
+    }
+
+
+# hit ratio of the cached GET /tasks and GET /projects/tasks responses
+@router.get("/cache")
+def get_cache_metrics():
+    return response_cache.stats()
+
+
+# open change streams, and events dropped because a client read too slowly
+@router.get("/events")
+def get_event_metrics():
+    return broker.stats()
+
+
+# where the time of each route goes: DB, serialization, queries and rows per request
+@router.get("/routes")
+def get_route_metrics():
+    return route_stats.snapshot()
+
+
+# reads served by each replica and the primary, and replicas currently failed over
+@router.get("/replicas")
+def get_replica_metrics():
+    return replica_router.stats()
@@ -1,26 +1,47 @@
 import uuid
-from sqlalchemy import and_
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Header, Query, Response
 from fastapi import Depends, HTTPException
+from sqlalchemy import func, literal, select, union_all
 from starlette import status
-from sqlalchemy.orm import Session, joinedload, aliased
-from starlette.requests import Request
-from db import Project, Task
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from db import Project, Task, Tombstone, replica_router, run_db, get_db
 from datetime import datetime
-from src.endpoints.auth import get_current_user
-from typing import Annotated
+from src.endpoints.auth import get_current_user, get_read_db
+from typing import Annotated, get_args
+from src.utils.cache import response_cache
+from src.utils.etag import etag_matches, make_etag, not_modified
+from src.utils.events import broker
+from src.utils.fields import parse_fields, partial_model
+from src.utils.persist import save, update_returning
+from src.utils.search import search_tasks
+from src.utils.stats import apply_task_changes, summary_row
+from src.utils.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    paginate,
+)
+from src.utils.serialization import (
+    FastJSONResponse,
+    dump_list_json,
+    list_response,
+    model_columns,
+)
 from src.types.project import (
     ProjectCreateRequest,
     ProjectEditRequest,
     ProjectGetResponse,
     SimpleResponse,
 )
+from src.types.task import TaskGetResponse
 
 # APIRouter creates path operations for item module
 router = APIRouter(
     prefix="/projects",
     tags=["Project"],
     responses={404: {"description": "Not found"}},
+    default_response_class=FastJSONResponse,
 )
 
 
@@ -34,120 +55,298 @@ def get_project(db_session: Session, project_id: str):
     )
 
 
-# DB接続のセッションを各エンドポイントの関数に渡す
-def get_db(request: Request):
-    return request.state.db
+# same as get_project, without blocking the event loop
+async def get_project_async(db_session, project_id: str):
+    return await run_db(db_session, get_project, project_id)
+
+
+# utility func to get one page of the user's projects and their tasks
+def list_projects(
+    db_session: Session,
+    user_id: str,
+    title: str,
+    cursor: str,
+    limit: int,
+    model=ProjectGetResponse,
+):
+    if title:
+        # search results are ranked, they come in a single page
+        return search_projects(db_session, user_id, title, limit), None
+
+    return list_projects_by_title(db_session, user_id, None, cursor, limit, model)
+
+
+# utility func to get the projects of the tasks matching title,
+# each with only its matching tasks
+def search_projects(db_session: Session, user_id: str, title: str, limit: int):
+    tasks = search_tasks(db_session, user_id, title, limit)
+
+    # projects are ordered by their best matching task
+    tasks_by_project = {}
+    for task in tasks:
+        tasks_by_project.setdefault(task.project_id, []).append(task)
+    projects = {
+        project.id: project
+        for project in db_session.query(Project).filter(
+            Project.id.in_(tasks_by_project), Project.user_id == user_id
+        )
+    }
+
+    results = []
+    for project_id, project_tasks in tasks_by_project.items():
+        if project_id in projects:
+            # set_committed_value keeps the partial list out of the unit of work
+            set_committed_value(projects[project_id], "tasks", project_tasks)
+            results.append(projects[project_id])
+    return results
+
+
+# utility func to get one page of the user's projects filtered by project title
+def list_projects_by_title(
+    db_session: Session,
+    user_id: str,
+    title: str,
+    cursor: str,
+    limit: int,
+    model=ProjectGetResponse,
+):
+    # id and updated_at make the cursor
+    columns = model_columns(model, Project, ("id", "updated_at"))
+    projects = db_session.query(*columns).filter(Project.user_id == user_id)
+    if title:
+        projects = projects.filter(Project.title.startswith(title))
+
+    projects, next_cursor = paginate(projects, Project, cursor, limit)
+    return with_task_rows(db_session, projects, model), next_cursor
+
+
+# utility func to add the tasks of project rows, with one extra IN query,
+# as rows of the columns of the task model nested in model
+def with_task_rows(db_session: Session, projects: list, model=ProjectGetResponse):
+    if "tasks" not in model.model_fields:
+        return projects
+
+    (task_model,) = get_args(model.model_fields["tasks"].annotation)
+    columns = model_columns(task_model, Task, ("project_id",))
+    tasks_by_project = {project.id: [] for project in projects}
+    if projects:
+        tasks = db_session.query(*columns).filter(
+            Task.project_id.in_(tasks_by_project)
+        )
+        for task in tasks:
+            tasks_by_project[task.project_id].append(task)
+    return [
+        {**project._asdict(), "tasks": tasks_by_project[project.id]}
+        for project in projects
+    ]
+
+
+# the response model of project lists with ?fields= and ?task_fields=
+def project_list_model(fields: str | None, task_fields: str | None):
+    task_names = parse_fields(TaskGetResponse, task_fields)
+    nested = ()
+    if task_names is not None:
+        nested = (("tasks", list[partial_model(TaskGetResponse, task_names)]),)
+    names = parse_fields(ProjectGetResponse, fields)
+    return partial_model(ProjectGetResponse, names, nested), (names, task_names)
+
+
+# utility func to get the row count and latest updated_at of the user's
+# projects and tasks in one query, they version the project lists
+def get_projects_version(db_session: Session, user_id: str):
+    def aggregate(model):
+        return select(
+            literal(model.__tablename__), func.count(), func.max(model.updated_at)
+        ).where(model.user_id == user_id)
+
+    rows = db_session.execute(union_all(aggregate(Project), aggregate(Task)))
+    return sorted(tuple(row) for row in rows)
+
+
+# etag of a project with its tasks, as loaded by get_project
+def project_etag(project: Project) -> str:
+    return make_etag(
+        "project",
+        project.id,
+        project.updated_at,
+        len(project.tasks),
+        max((task.updated_at for task in project.tasks), default=None),
+    )
+
+
+# utility func to insert a project and return it as stored
+def save_project(db_session: Session, project: Project):
+    # a new project has no tasks, set it so the response doesn't query them
+    project.tasks = []
+    return save(db_session, project)
+
+
+# utility func to overwrite a project, returns None when it doesn't exist
+def edit_project(db_session: Session, project_id: str, values: dict):
+    project = update_returning(
+        db_session, Project, [Project.id == project_id], values
+    )
+    if project:
+        # the response lists the tasks of the project
+        tasks = db_session.query(Task).filter(Task.project_id == project_id).all()
+        set_committed_value(project, "tasks", tasks)
+    return project
+
+
+# utility func to delete a project, returns False when it doesn't exist
+def remove_project(db_session: Session, project_id: str):
+    project = get_project(db_session, project_id)
+    if not project:
+        return False
+
+    now = datetime.now()
+    # the delete detaches the tasks, bump them so /sync sends the new project_id
+    old_rows = [summary_row(task) for task in project.tasks]
+    apply_task_changes(
+        db_session, old_rows, [{**row, "project_id": None} for row in old_rows]
+    )
+    for task in project.tasks:
+        task.updated_at = now
+    db_session.delete(project)
+    db_session.add(
+        Tombstone(
+            id=str(uuid.uuid4()),
+            entity="project",
+            entity_id=project.id,
+            user_id=project.user_id,
+            deleted_at=now,
+        )
+    )
+    db_session.commit()
+    return True
 
 
 # Return projects and related tasks. Called on Task list page
 @router.get("/tasks", response_model=list[ProjectGetResponse])
-def get_projects(
+async def get_projects(
     title: str = Query(None, title="title"),
-    db: Session = Depends(get_db),
+    cursor: str = Query(None, title="cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: str = Query(None, title="fields"),
+    task_fields: str = Query(None, title="task_fields"),
+    if_none_match: str = Header(None),
+    db: Session = Depends(get_read_db),
     current_user=Depends(get_current_user),
 ):
     """
-    Retrieves a list of projects based on the provided filters.
+    Retrieves one page of projects, with their tasks, based on the provided filters.
+
+    With title, returns the projects of the `limit` tasks whose title best
+    matches it (prefix first, then substring), each with only those tasks,
+    in a single page.
 
     Parameters:
-        - title (str): The title of the projects to filter by. Defaults to None.
+        - title (str): The text to search in the titles of tasks. Defaults to None.
+        - cursor (str): The X-Next-Cursor header of the previous page. Defaults to None.
+        - limit (int): The maximum number of projects in the page.
+        - fields (str): Comma-separated fields of the projects to return, e.g.
+          "id,title,tasks". Without tasks, tasks aren't queried. Defaults to all.
+        - task_fields (str): Comma-separated fields of their tasks, e.g.
+          "id,title,status". Defaults to all.
+        - if_none_match (str): The ETag of a previous response. Defaults to None.
         - db (Session): The database session to use for querying projects.
         - current_user: The current user making the request.
 
     Returns:
         - list[ProjectGetResponse]: A list of projects that match the provided filters.
+          304 with no body when no project or task of the user changed since the ETag.
     """
-    if title:
-        # Create a Task aliased table.
-        TaskAlias = aliased(Task)
-
-        # Filter out porjects that don't match the title.
-        projects = (
-            db.query(Project)
-            .join(TaskAlias, Project.tasks)
-            .filter(
-                and_(
-                    TaskAlias.title.startswith(title),
-                    Project.user_id == current_user["id"],
-                )
-            )
-            .options(joinedload(Project.tasks))
-            .all()
+    model, names = project_list_model(fields, task_fields)
+    version = await run_db(db, get_projects_version, current_user["id"])
+    etag = make_etag("projects/tasks", version, title, cursor, limit, names)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    async def load():
+        projects, next_cursor = await run_db(
+            db, list_projects, current_user["id"], title, cursor, limit, model
         )
-        # Filter out tasks that don't match the title.
-        for project in projects:
-            project.tasks = [
-                task for task in project.tasks if task.title.startswith(title)
-            ]
-    else:
-        try:
-            projects = (
-                db.query(Project)
-                .filter(Project.user_id == current_user["id"])
-                .options(joinedload(Project.tasks))
-                .all()
-            )
-        except AttributeError:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
-            )
-    return projects
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+        return dump_list_json(model, projects), headers
+
+    # the version is part of the key so the body always matches the ETag
+    params = {
+        "title": title,
+        "cursor": cursor,
+        "limit": limit,
+        "fields": names,
+        "version": version,
+    }
+    response = await response_cache.fetch(
+        current_user["id"], "projects", params, load
+    )
+    response.headers["ETag"] = etag
+    return response
 
 
 # Return only projects. Called on Project list page
 @router.get("", response_model=list[ProjectGetResponse])
-def get_projects(
+async def get_projects(
     title: str = Query(None, title="title"),
-    db: Session = Depends(get_db),
+    cursor: str = Query(None, title="cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: str = Query(None, title="fields"),
+    task_fields: str = Query(None, title="task_fields"),
+    if_none_match: str = Header(None),
+    db: Session = Depends(get_read_db),
     current_user=Depends(get_current_user),
 ):
     """
-    Retrieves a list of projects based on the provided filters.
+    Retrieves one page of projects based on the provided filters.
 
     Parameters:
         - title (str): The title of the projects to filter by. Defaults to None.
+        - cursor (str): The X-Next-Cursor header of the previous page. Defaults to None.
+        - limit (int): The maximum number of projects in the page.
+        - fields (str), task_fields (str): The fields to return, as in
+          GET /projects/tasks. Default to all.
+        - if_none_match (str): The ETag of a previous response. Defaults to None.
         - db (Session): The database session to use for querying projects.
         - current_user: The current user making the request.
 
     Returns:
         - list[ProjectGetResponse]: A list of projects that match the provided filters.
+          304 with no body when no project or task of the user changed since the ETag.
     """
-    if title:
-        projects = (
-            db.query(Project)
-            .filter(
-                and_(
-                    Project.title.startswith(title),
-                    Project.user_id == current_user["id"],
-                )
-            )
-            .all()
-        )
-    else:
-        print(
-            "current_user",
-            current_user,
-            db.query(Project).options(joinedload(Project.tasks)).all(),
-        )
-        try:
-            projects = (
-                db.query(Project).filter(Project.user_id == current_user["id"]).all()
-            )
-        except AttributeError:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
-            )
-    return projects
+    model, names = project_list_model(fields, task_fields)
+    version = await run_db(db, get_projects_version, current_user["id"])
+    etag = make_etag("projects", version, title, cursor, limit, names)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    projects, next_cursor = await run_db(
+        db, list_projects_by_title, current_user["id"], title, cursor, limit, model
+    )
+    headers = {"ETag": etag}
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return list_response(model, projects, headers)
 
 
 # 単一のprojectを取得
 @router.get("/{project_id}", response_model=ProjectGetResponse)
-def get_project_by_id(
+async def get_project_by_id(
     project_id: str,
-    db: Session = Depends(get_db),
+    response: Response,
+    if_none_match: str = Header(None),
+    db: Session = Depends(get_read_db),
     current_user=Depends(get_current_user),
 ):
-    project = get_project(db, project_id).filter(Project.user_id == current_user["id"])
+    project = await get_project_async(db, project_id)
+    if not project or project.user_id != current_user["id"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
+        )
+
+    etag = project_etag(project)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return project
 
 
@@ -175,9 +374,10 @@ async def create_project(
     project.created_at = now
     project.updated_at = now
 
-    db.add(project)
-    db.commit()
-    # project = get_project(db, project.id)
+    project = await run_db(db, save_project, project)
+    await response_cache.invalidate(current_user["id"], "projects")
+    await replica_router.wrote(current_user["id"])
+    broker.publish(current_user["id"], "project", "created", [project.id])
     return project
 
 
@@ -191,24 +391,27 @@ async def update_project(
 ):
     now = datetime.now()
 
-    project = get_project(db, project_id)
+    project = await run_db(
+        db,
+        edit_project,
+        project_id,
+        {
+            "title": project_created.title,
+            "status": project_created.status,
+            "from_date": project_created.from_date,
+            "to_date": project_created.to_date,
+            "user_id": current_user["id"],
+            "updated_at": now,
+        },
+    )
 
     if not project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
         )
-
-    project.title = project_created.title
-    project.status = project_created.status
-    project.from_date = project_created.from_date
-    project.to_date = project_created.to_date
-    project.user_id = current_user["id"]
-
-    project.updated_at = now
-
-    db.commit()
-    # return project that is committed already
-    # project = get_project(db, project_id)
+    await response_cache.invalidate(current_user["id"], "projects")
+    await replica_router.wrote(current_user["id"])
+    broker.publish(current_user["id"], "project", "updated", [project.id])
     return project
 
 
@@ -219,13 +422,12 @@ async def delete_project(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
-    project = get_project(db, project_id)
-
-    if not project:
+    if not await run_db(db, remove_project, project_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
         )
-
-    db.delete(project)
-    db.commit()
+    # the tasks of the project are detached from it
+    await response_cache.invalidate(current_user["id"], "projects", "tasks")
+    await replica_router.wrote(current_user["id"])
+    broker.publish(current_user["id"], "project", "deleted", [project_id])
     return SimpleResponse(status="OK")
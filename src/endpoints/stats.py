@@ -0,0 +1,99 @@
+import os
+from datetime import datetime
+from fastapi import APIRouter, Depends
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.orm import Session
+from db import Task, TaskSummary, run_db
+from src.endpoints.auth import get_current_user, get_read_db
+from src.utils import stats
+from src.types.stats import StatsResponse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# statuses of finished tasks, which are never overdue
+DONE_STATUSES = [
+    value.strip() for value in os.getenv("DONE_STATUSES", "done").split(",")
+]
+
+# APIRouter creates path operations for item module
+router = APIRouter(
+    prefix="/stats",
+    tags=["Stats"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+# utility func to get (dimension, value, tasks, man_hour_min) of every group
+# of the user's tasks, from TaskSummary or with one GROUP BY per dimension
+def list_task_groups(db_session: Session, user_id: str):
+    if stats.STATS_SUMMARY:
+        rows = db_session.execute(
+            select(
+                TaskSummary.dimension,
+                TaskSummary.value,
+                TaskSummary.tasks,
+                TaskSummary.man_hour_min,
+            ).where(TaskSummary.user_id == user_id, TaskSummary.tasks > 0)
+        )
+        return [(dimension, value or None, *rest) for dimension, value, *rest in rows]
+
+    groups = [
+        select(
+            literal(dimension),
+            column,
+            func.count(),
+            func.coalesce(func.sum(Task.man_hour_min), 0),
+        )
+        .where(Task.user_id == user_id)
+        .group_by(column)
+        for dimension, column in stats.DIMENSIONS.items()
+    ]
+    return [tuple(row) for row in db_session.execute(union_all(*groups))]
+
+
+# utility func to count the user's unfinished tasks past their to_date
+def count_overdue_tasks(db_session: Session, user_id: str):
+    return db_session.scalar(
+        select(func.count()).where(
+            Task.user_id == user_id,
+            Task.to_date < datetime.now(),
+            Task.status.not_in(DONE_STATUSES),
+        )
+    )
+
+
+def get_task_stats(db_session: Session, user_id: str):
+    by_dimension = {dimension: [] for dimension in stats.DIMENSIONS}
+    for dimension, value, tasks, man_hour_min in list_task_groups(db_session, user_id):
+        by_dimension[dimension].append(
+            {"key": value, "tasks": tasks, "man_hour_min": man_hour_min}
+        )
+    # every task is in exactly one project group, None included
+    projects = by_dimension["project"]
+    return {
+        "tasks": sum(group["tasks"] for group in projects),
+        "man_hour_min": sum(group["man_hour_min"] for group in projects),
+        "overdue": count_overdue_tasks(db_session, user_id),
+        "projects": projects,
+        "statuses": by_dimension["status"],
+        "priorities": by_dimension["priority"],
+        "types": by_dimension["type"],
+    }
+
+
+# taskの集計
+@router.get("", response_model=StatsResponse)
+async def get_stats(
+    db: Session = Depends(get_read_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Aggregates the current user's tasks in the database.
+
+    Returns:
+        - StatsResponse: The task count and total man_hour_min, the tasks
+          past their to_date whose status isn't in DONE_STATUSES, and the
+          count and man_hour_min per project, status, priority and type.
+    """
+    return await run_db(db, get_task_stats, current_user["id"])
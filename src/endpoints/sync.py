@@ -0,0 +1,180 @@
+import os
+import json
+import base64
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from starlette import status
+from db import Project, Task, Tombstone, engine, run_db, get_db
+from src.endpoints.auth import get_current_user
+from src.types.sync import SyncResponse
+from src.utils.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    paginate,
+)
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# a token points this many seconds before the time it was issued, so rows
+# written by transactions still in flight at that time are sent again next sync
+SYNC_OVERLAP_SECONDS = float(os.getenv("SYNC_OVERLAP_SECONDS", "5"))
+
+# tombstones older than this are purged, tokens older than this get 410 and
+# the client syncs from scratch
+TOMBSTONE_RETENTION_DAYS = float(os.getenv("TOMBSTONE_RETENTION_DAYS", "30"))
+
+# the entities the first sync pages through, in this order
+BOOTSTRAP_ENTITIES = {"projects": Project, "tasks": Task}
+
+# APIRouter creates path operations for item module
+router = APIRouter(
+    prefix="/sync",
+    tags=["Sync"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+def encode_token(since: datetime) -> str:
+    return base64.urlsafe_b64encode(since.isoformat().encode()).decode().rstrip("=")
+
+
+def decode_token(token: str) -> datetime:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        return datetime.fromisoformat(raw.decode())
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid token"
+        )
+
+
+def encode_bootstrap_cursor(token: str, entity: str, page_cursor: str | None) -> str:
+    raw = json.dumps([token, entity, page_cursor]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_bootstrap_cursor(cursor: str) -> tuple[str, str, str | None]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        token, entity, page_cursor = json.loads(raw)
+        if entity not in BOOTSTRAP_ENTITIES:
+            raise ValueError(entity)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+    decode_token(token)
+    return token, entity, page_cursor
+
+
+# utility func to get the user's tasks, projects and tombstones changed since a time
+def list_changes(db_session: Session, user_id: str, since: datetime):
+    def changed(model, column):
+        # served by the (user_id, updated_at/deleted_at) indexes
+        rows = select(model).where(model.user_id == user_id, column >= since)
+        return list(db_session.scalars(rows.order_by(column)))
+
+    return {
+        "tasks": changed(Task, Task.updated_at),
+        "projects": changed(Project, Project.updated_at),
+        "deleted": [
+            {"entity": t.entity, "id": t.entity_id, "deleted_at": t.deleted_at}
+            for t in changed(Tombstone, Tombstone.deleted_at)
+        ],
+    }
+
+
+# utility func to get one page of the user's rows of an entity for the first sync
+def list_bootstrap_page(
+    db_session: Session, user_id: str, entity: str, cursor: str | None, limit: int
+):
+    model = BOOTSTRAP_ENTITIES[entity]
+    rows = db_session.query(model).filter(model.user_id == user_id)
+    return paginate(rows, model, cursor, limit)
+
+
+def purge_tombstones(connection) -> int:
+    """
+    Deletes the tombstones older than TOMBSTONE_RETENTION_DAYS.
+
+    Returns:
+        - int: The number of tombstones deleted.
+    """
+    cutoff = datetime.now() - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+    result = connection.execute(delete(Tombstone).where(Tombstone.deleted_at < cutoff))
+    return result.rowcount
+
+
+# 前回の同期以降の変更を取得 (replicaの遅延で変更を取りこぼさないようprimaryから読む)
+@router.get("", response_model=SyncResponse)
+async def sync(
+    response: Response,
+    since: str = Query(None, title="since"),
+    cursor: str = Query(None, title="cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Retrieves the current user's tasks and projects created, updated or
+    deleted since a previous sync.
+
+    Parameters:
+        - since (str): The token of the previous sync. Without it the first
+          sync pages through every project, then every task.
+        - cursor (str): The X-Next-Cursor header of the previous page of the
+          first sync. Defaults to None.
+        - limit (int): The maximum number of rows in a page of the first sync.
+
+    Returns:
+        - SyncResponse: The changed tasks and projects, the deleted ones and
+          the token to send as since next time. A row may come in two
+          consecutive syncs, clients should apply changes idempotently.
+          Pages of the first sync have an X-Next-Cursor header but the last,
+          and all carry the token issued by the first page, so the next sync
+          returns what changed while paging.
+          410 when since is older than TOMBSTONE_RETENTION_DAYS: the deletes
+          since then may be purged, the client syncs from scratch.
+    """
+    if since:
+        since_time = decode_token(since)
+        if since_time < datetime.now() - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE, detail="Full resync required"
+            )
+        # taken before reading, so nothing written after the reads is skipped
+        token = encode_token(datetime.now() - timedelta(seconds=SYNC_OVERLAP_SECONDS))
+        changes = await run_db(db, list_changes, current_user["id"], since_time)
+        return {**changes, "token": token}
+
+    if cursor:
+        token, entity, page_cursor = decode_bootstrap_cursor(cursor)
+    else:
+        token = encode_token(datetime.now() - timedelta(seconds=SYNC_OVERLAP_SECONDS))
+        entity, page_cursor = next(iter(BOOTSTRAP_ENTITIES)), None
+    rows, page_cursor = await run_db(
+        db, list_bootstrap_page, current_user["id"], entity, page_cursor, limit
+    )
+
+    entities = list(BOOTSTRAP_ENTITIES)
+    next_entity = entity
+    if page_cursor is None:
+        # this entity is done, the next page starts the following one
+        position = entities.index(entity) + 1
+        next_entity = entities[position] if position < len(entities) else None
+    if next_entity:
+        response.headers[NEXT_CURSOR_HEADER] = encode_bootstrap_cursor(
+            token, next_entity, page_cursor
+        )
+    return {"tasks": [], "projects": [], "deleted": [], entity: rows, "token": token}
+
+
+# Run `python -m src.endpoints.sync` daily, e.g. from cron, to purge old tombstones
+if __name__ == "__main__":
+    with engine.begin() as connection:
+        purged = purge_tombstones(connection)
+    print(f"{purged} tombstones purged")
@@ -1,23 +1,51 @@
+import os
 import uuid
-from fastapi import Depends, HTTPException, APIRouter
+from fastapi import Body, Depends, Header, HTTPException, APIRouter, Query, Response
+from sqlalchemy import delete, func, insert, select, update
 from sqlalchemy.orm import Session
-from starlette.requests import Request
-from db import Task
-from datetime import datetime
+from db import Task, Tombstone, replica_router, run_db, get_db
+from datetime import date, datetime
 from starlette import status
-from src.endpoints.auth import get_current_user
+from src.endpoints.auth import get_current_user, get_read_db
+from src.utils.cache import response_cache
+from src.utils.etag import etag_matches, make_etag, not_modified
+from src.utils.events import broker
+from src.utils.fields import parse_fields, partial_model
+from src.utils.persist import save, update_returning
+from src.utils.periods import bucket_by_day, overlaps
+from src.utils.search import search_tasks
+from src.utils.stats import apply_task_changes, get_summary_rows, summary_row
+from src.utils.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    paginate,
+)
+from src.utils.serialization import FastJSONResponse, dump_list_json, model_columns
 from src.types.task import (
     TaskCreateRequest,
     TaskGetResponse,
     TaskEditRequest,
+    TaskBulkEditRequest,
+    BulkResponse,
+    CalendarDay,
     SimpleResponse,
 )
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# upper bound of the items of one /tasks/bulk request
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "1000"))
+# upper bound of the days of one /tasks/calendar request
+CALENDAR_MAX_DAYS = int(os.getenv("CALENDAR_MAX_DAYS", "366"))
 
 # APIRouter creates path operations for item module
 router = APIRouter(
     prefix="/tasks",
     tags=["Task"],
     responses={404: {"description": "Not found"}},
+    default_response_class=FastJSONResponse,
 )
 
 
@@ -26,37 +54,391 @@ def get_task(db_session: Session, task_id: str):
     return db_session.query(Task).filter(Task.id == task_id).first()
 
 
-# DB接続のセッションを各エンドポイントの関数に渡す
-def get_db(request: Request):
-    # this property is injected on main.py
-    # the content of this property is the db session
-    return request.state.db
+# same as get_task, without blocking the event loop
+async def get_task_async(db_session, task_id: str):
+    return await run_db(db_session, get_task, task_id)
+
+
+# utility func to get one page of the user's tasks
+def list_tasks(
+    db_session: Session,
+    user_id: str,
+    cursor: str,
+    limit: int,
+    date_from: datetime = None,
+    date_to: datetime = None,
+    model=TaskGetResponse,
+):
+    # plain rows of the columns of model, no ORM objects to build,
+    # id and updated_at make the cursor
+    columns = model_columns(model, Task, ("id", "updated_at"))
+    tasks = db_session.query(*columns).filter(Task.user_id == user_id)
+    if date_from or date_to:
+        dialect = db_session.get_bind().dialect.name
+        tasks = tasks.filter(overlaps(dialect, date_from, date_to))
+    return paginate(tasks, Task, cursor, limit)
+
+
+# utility func to get the row count and latest updated_at of the user's tasks,
+# every write changes one of them so they version the task list
+def get_tasks_version(db_session: Session, user_id: str):
+    return tuple(
+        db_session.execute(
+            select(func.count(), func.max(Task.updated_at)).where(
+                Task.user_id == user_id
+            )
+        ).one()
+    )
+
+
+# utility func to insert a task and return it as stored
+def save_task(db_session: Session, task: Task):
+    apply_task_changes(db_session, [], [summary_row(task)])
+    return save(db_session, task)
+
+
+# utility func to overwrite a task, returns None when it doesn't exist
+def edit_task(db_session: Session, task_id: str, values: dict):
+    old_rows = get_summary_rows(db_session, [task_id])
+    if old_rows:
+        apply_task_changes(db_session, old_rows, [summary_row(values)])
+    return update_returning(db_session, Task, [Task.id == task_id], values)
+
+
+# utility func to delete a task, returns False when it doesn't exist
+def remove_task(db_session: Session, task_id: str):
+    # locked like get_summary_rows, the summary moves from the values read here
+    task = db_session.query(Task).filter(Task.id == task_id).with_for_update().first()
+    if not task:
+        return False
+
+    db_session.delete(task)
+    apply_task_changes(db_session, [summary_row(task)], [])
+    # recorded in the same transaction for /sync
+    db_session.add(
+        Tombstone(
+            id=str(uuid.uuid4()),
+            entity="task",
+            entity_id=task.id,
+            user_id=task.user_id,
+            deleted_at=datetime.now(),
+        )
+    )
+    db_session.commit()
+    return True
+
+
+# utility func to get which of task_ids exist and belong to the user
+def get_owned_task_ids(db_session: Session, user_id: str, task_ids: list[str]):
+    return set(
+        db_session.scalars(
+            select(Task.id).where(Task.id.in_(task_ids), Task.user_id == user_id)
+        )
+    )
+
+
+# utility func to insert many tasks with one executemany
+def bulk_save_tasks(db_session: Session, rows: list[dict]):
+    db_session.execute(insert(Task), rows)
+    apply_task_changes(db_session, [], [summary_row(row) for row in rows])
+    db_session.commit()
+
+
+# utility func to overwrite many tasks of the user with one executemany,
+# returns the ids that were found
+def bulk_edit_tasks(db_session: Session, user_id: str, rows: list[dict]):
+    found = get_owned_task_ids(db_session, user_id, [row["id"] for row in rows])
+    # an id sent twice is written once, with its last values, so the summary
+    # moves from its one old row to one new row
+    rows = list({row["id"]: row for row in rows if row["id"] in found}.values())
+    if rows:
+        new_rows = [summary_row({**row, "user_id": user_id}) for row in rows]
+        apply_task_changes(db_session, get_summary_rows(db_session, found), new_rows)
+        # ORM bulk UPDATE by primary key
+        db_session.execute(update(Task), rows)
+    db_session.commit()
+    return found
+
+
+# utility func to delete many tasks of the user, returns the ids that were found
+def bulk_remove_tasks(db_session: Session, user_id: str, task_ids: list[str]):
+    found = get_owned_task_ids(db_session, user_id, task_ids)
+    if found:
+        apply_task_changes(db_session, get_summary_rows(db_session, found), [])
+        db_session.execute(
+            delete(Task).where(Task.id.in_(found)),
+            execution_options={"synchronize_session": False},
+        )
+        now = datetime.now()
+        db_session.execute(
+            insert(Tombstone),
+            [
+                {
+                    "id": str(uuid.uuid4()),
+                    "entity": "task",
+                    "entity_id": task_id,
+                    "user_id": user_id,
+                    "deleted_at": now,
+                }
+                for task_id in found
+            ],
+        )
+    db_session.commit()
+    return found
+
+
+# task writes change GET /tasks and the tasks embedded in GET /projects/tasks,
+# are streamed to the user's open /events, and keep the user's reads on the primary
+async def tasks_changed(user_id: str, op: str, task_ids: list[str]):
+    await response_cache.invalidate(user_id, "tasks", "projects")
+    await replica_router.wrote(user_id)
+    broker.publish(user_id, "task", op, task_ids)
+
+
+def check_bulk_size(items: list):
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {BULK_MAX_ITEMS} items per request",
+        )
 
 
 # taskの全取得
 @router.get("", response_model=list[TaskGetResponse])
-def get_tasks(
+async def get_tasks(
+    cursor: str = Query(None, title="cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    date_from: datetime = Query(None, alias="from"),
+    date_to: datetime = Query(None, alias="to"),
+    fields: str = Query(None, title="fields"),
+    if_none_match: str = Header(None),
+    db: Session = Depends(get_read_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Retrieves one page of the current user's tasks, most recently updated first.
+
+    Parameters:
+        - cursor (str): The X-Next-Cursor header of the previous page. Defaults to None.
+        - limit (int): The maximum number of tasks in the page.
+        - from (datetime), to (datetime): Only the tasks whose from_date..to_date
+          period overlaps this range, e.g. the visible week of a calendar.
+          Default to None.
+        - fields (str): Comma-separated fields of the tasks to return, e.g.
+          "id,title,status". Only their columns are selected. Defaults to all.
+        - if_none_match (str): The ETag of a previous response. Defaults to None.
+
+    Returns:
+        - list[TaskGetResponse]: The tasks in the page. The X-Next-Cursor header
+          holds the cursor of the next page and is absent on the last page.
+          304 with no body when none of the user's tasks changed since the ETag.
+    """
+    field_names = parse_fields(TaskGetResponse, fields)
+    model = partial_model(TaskGetResponse, field_names)
+    version = await run_db(db, get_tasks_version, current_user["id"])
+    params = {
+        "cursor": cursor,
+        "limit": limit,
+        "from": date_from,
+        "to": date_to,
+        "fields": field_names,
+    }
+    etag = make_etag("tasks", version, params)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    async def load():
+        tasks, next_cursor = await run_db(
+            db,
+            list_tasks,
+            current_user["id"],
+            cursor,
+            limit,
+            date_from,
+            date_to,
+            model,
+        )
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+        return dump_list_json(model, tasks), headers
+
+    # keyed by the version too, a body cached by another worker before a write
+    # it wasn't told about is never sent with the ETag of the current data
+    response = await response_cache.fetch(
+        current_user["id"], "tasks", {**params, "version": version}, load
+    )
+    response.headers["ETag"] = etag
+    return response
+
+
+# taskのタイトル検索
+@router.get("/search", response_model=list[TaskGetResponse])
+async def search_tasks_by_title(
+    q: str = Query(..., min_length=1, title="q"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Searches the current user's tasks by title.
+
+    Parameters:
+        - q (str): The text to find in titles, case-insensitively.
+        - limit (int): The maximum number of tasks returned.
+
+    Returns:
+        - list[TaskGetResponse]: Tasks whose title starts with q first,
+          then the other best matches.
+    """
+    return await run_db(db, search_tasks, current_user["id"], q, limit)
+
+
+# 日ごとのtask数と工数 (カレンダー表示用)
+@router.get("/calendar", response_model=list[CalendarDay])
+async def get_calendar(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    db: Session = Depends(get_read_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Counts the current user's tasks per day, for month views of a calendar.
+
+    Parameters:
+        - from (date), to (date): The first and last day, at most
+          CALENDAR_MAX_DAYS days apart.
+
+    Returns:
+        - list[CalendarDay]: For each day, the tasks whose period includes it
+          and their man_hour_min spread evenly over the days of their period.
+    """
+    if not 0 <= (date_to - date_from).days < CALENDAR_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"to must be from or up to {CALENDAR_MAX_DAYS - 1} days after it",
+        )
+    return await run_db(db, bucket_by_day, current_user["id"], date_from, date_to)
+
+
+# taskの一括登録
+@router.post("/bulk", response_model=BulkResponse)
+async def create_tasks(
+    tasks_created: list[TaskCreateRequest],
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
-    tasks = db.query(Task)
+    """
+    Creates many tasks in one transaction.
+
+    Returns:
+        - BulkResponse: The id of each created task, in the order of the request.
+    """
+    check_bulk_size(tasks_created)
+    now = datetime.now()
 
-    # project_idでProjectを検索
-    return tasks.filter(Task.user_id == current_user.id).all()
+    rows = [
+        {
+            **task_created.model_dump(exclude={"user_id"}),
+            "id": str(uuid.uuid4()),
+            "user_id": current_user["id"],
+            "created_at": now,
+            "updated_at": now,
+        }
+        for task_created in tasks_created
+    ]
+    if rows:
+        await run_db(db, bulk_save_tasks, rows)
+        await tasks_changed(current_user["id"], "created", [row["id"] for row in rows])
+    return {"results": [{"id": row["id"], "status": "created"} for row in rows]}
+
+
+# taskの一括更新
+@router.put("/bulk", response_model=BulkResponse)
+async def update_tasks(
+    tasks_edited: list[TaskBulkEditRequest],
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Overwrites many tasks of the current user in one transaction.
+
+    Returns:
+        - BulkResponse: "updated", or "not_found" for ids that don't exist
+          or belong to another user, in the order of the request.
+    """
+    check_bulk_size(tasks_edited)
+    now = datetime.now()
+
+    rows = [
+        {**task_edited.model_dump(), "updated_at": now} for task_edited in tasks_edited
+    ]
+    found = set()
+    if rows:
+        found = await run_db(db, bulk_edit_tasks, current_user["id"], rows)
+    if found:
+        updated = [row["id"] for row in rows if row["id"] in found]
+        await tasks_changed(current_user["id"], "updated", updated)
+    return {
+        "results": [
+            {
+                "id": row["id"],
+                "status": "updated" if row["id"] in found else "not_found",
+            }
+            for row in rows
+        ]
+    }
+
+
+# taskの一括削除
+@router.delete("/bulk", response_model=BulkResponse)
+async def delete_tasks(
+    task_ids: list[str] = Body(..., example=["32ed23f32f2311"]),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Deletes many tasks of the current user in one transaction.
+
+    Returns:
+        - BulkResponse: "deleted", or "not_found" for ids that don't exist
+          or belong to another user, in the order of the request.
+    """
+    check_bulk_size(task_ids)
+
+    found = (
+        await run_db(db, bulk_remove_tasks, current_user["id"], task_ids)
+        if task_ids
+        else set()
+    )
+    if found:
+        deleted = [task_id for task_id in task_ids if task_id in found]
+        await tasks_changed(current_user["id"], "deleted", deleted)
+    return {
+        "results": [
+            {"id": task_id, "status": "deleted" if task_id in found else "not_found"}
+            for task_id in task_ids
+        ]
+    }
 
 
 # 単一のtaskを取得
 @router.get("/{task_id}", response_model=TaskGetResponse)
-def get_task_by_id(
+async def get_task_by_id(
     task_id: str,
-    db: Session = Depends(get_db),
+    response: Response,
+    if_none_match: str = Header(None),
+    db: Session = Depends(get_read_db),
     current_user=Depends(get_current_user),
 ):
-    task = get_task(db, task_id).filter(Task.user_id == current_user.id)
-    if not task:
+    task = await get_task_async(db, task_id)
+    if not task or task.user_id != current_user["id"]:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
         )
+
+    etag = make_etag("task", task.id, task.updated_at)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return task
 
 
@@ -84,9 +466,8 @@ async def create_task(
     task.created_at = now
     task.updated_at = now
 
-    db.add(task)
-    db.commit()
-    task = get_task(db, task.id)
+    task = await run_db(db, save_task, task)
+    await tasks_changed(current_user["id"], "created", [task.id])
     return task
 
 
@@ -100,29 +481,29 @@ async def update_task(
 ):
     now = datetime.now()
 
-    task = get_task(db, task_id)
+    task = await run_db(
+        db,
+        edit_task,
+        task_id,
+        {
+            "title": task_created.title,
+            "status": task_created.status,
+            "man_hour_min": task_created.man_hour_min,
+            "from_date": task_created.from_date,
+            "to_date": task_created.to_date,
+            "priority": task_created.priority,
+            "type": task_created.type,
+            "project_id": task_created.project_id,
+            "user_id": current_user["id"],
+            "updated_at": now,
+        },
+    )
 
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
         )
-
-    task.title = task_created.title
-    task.status = task_created.status
-    task.man_hour_min = task_created.man_hour_min
-    task.from_date = task_created.from_date
-    task.to_date = task_created.to_date
-    task.priority = task_created.priority
-    task.type = task_created.type
-    task.project_id = task_created.project_id
-    task.user_id = current_user["id"]
-
-    task.updated_at = now
-
-    db.commit()
-    # return task that is committed already
-    task = get_task(db, task_id)
-    print("task", task)
+    await tasks_changed(current_user["id"], "updated", [task.id])
     return task
 
 
@@ -133,13 +514,9 @@ async def delete_task(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
-    task = get_task(db, task_id)
-
-    if not task:
+    if not await run_db(db, remove_task, task_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
         )
-
-    db.delete(task)
-    db.commit()
+    await tasks_changed(current_user["id"], "deleted", [task_id])
     return {"status": "OK"}
@@ -1,2 +1,25 @@
+from fastapi.testclient import TestClient
+from starlette import status
+from main import app
+
+client = TestClient(app)
+
+
 def test_login():
     pass
+
+
+def test_logout_revokes_token(new_user_headers):
+    response = client.get("/tasks", headers=new_user_headers)
+    assert response.status_code == status.HTTP_200_OK
+    response = client.post("/auth/logout", headers=new_user_headers)
+    assert response.status_code == status.HTTP_200_OK
+    response = client.get("/tasks", headers=new_user_headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_users_without_password(new_user_headers):
+    response = client.get("/auth", headers=new_user_headers)
+    assert response.status_code == status.HTTP_200_OK
+    for user in response.json():
+        assert set(user) == {"id", "username", "email", "created_at", "updated_at"}
@@ -0,0 +1,44 @@
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from main import app
+import pytest
+
+
+TASK_DATA = {
+    "title": "test",
+    "status": "test",
+    "type": "mtg",
+    "man_hour_min": 1,
+    "to_date": "2023-08-14T15:32:00",
+    "from_date": "2023-08-14T15:32:00",
+    "priority": "test",
+    "project_id": "test",
+}
+
+
+# the app and the websocket must share one event loop, so the client is entered
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+def test_websocket_streams_task_changes(client, new_user_token):
+    headers = {"Authorization": f"Bearer {new_user_token}"}
+    with client.websocket_connect("/events/ws?token=" + new_user_token) as websocket:
+        task = client.post("/tasks", headers=headers, json=TASK_DATA).json()
+        event = websocket.receive_json()
+        assert (event["entity"], event["op"], event["ids"]) == (
+            "task",
+            "created",
+            [task["id"]],
+        )
+
+        client.delete("/tasks/" + task["id"], headers=headers)
+        assert websocket.receive_json()["op"] == "deleted"
+
+
+def test_websocket_refuses_invalid_token(client):
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/events/ws?token=invalid") as websocket:
+            websocket.receive_json()
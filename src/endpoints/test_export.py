@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+from fastapi.testclient import TestClient
+from starlette import status
+from main import app
+from src.endpoints import export
+
+client = TestClient(app)
+
+
+TASK_DATA = {
+    "title": "test",
+    "status": "todo",
+    "type": "mtg",
+    "man_hour_min": 1,
+    "to_date": "2023-08-14T15:32:00",
+    "from_date": "2023-08-14T15:32:00",
+    "priority": "test",
+    "project_id": "p1",
+}
+
+
+def test_export_tasks(new_user_headers, monkeypatch):
+    # several batches per export
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+    tasks = [{**TASK_DATA, "title": f"task {i}"} for i in range(5)]
+    tasks[0] = {**tasks[0], "status": "done", "project_id": "p2"}
+    tasks[1] = {
+        **tasks[1],
+        "from_date": "2024-01-01T00:00:00",
+        "to_date": "2024-01-31T00:00:00",
+    }
+    client.post("/tasks/bulk", headers=new_user_headers, json=tasks)
+
+    response = client.get("/export/tasks", headers=new_user_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(row["title"] for row in rows) == [f"task {i}" for i in range(5)]
+    by_title = {row["title"]: row for row in rows}
+    assert by_title["task 2"]["to_date"] == "2023-08-14T15:32:00"
+
+    response = client.get("/export/tasks?format=csv", headers=new_user_headers)
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 5
+    assert list(rows[0]) == [column.key for column in export.TASK_COLUMNS]
+
+    def titles(query):
+        response = client.get("/export/tasks?" + query, headers=new_user_headers)
+        return {json.loads(line)["title"] for line in response.text.splitlines()}
+
+    assert titles("status=done") == {"task 0"}
+    assert titles("project_id=p2") == {"task 0"}
+    assert titles("from=2024-01-10T00:00:00&to=2024-02-01T00:00:00") == {"task 1"}
+
+
+def test_export_nothing_as_csv(new_user_headers):
+    response = client.get("/export/projects?format=csv", headers=new_user_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.text.strip() == ",".join(
+        column.key for column in export.PROJECT_COLUMNS
+    )
@@ -0,0 +1,84 @@
+import json
+from fastapi.testclient import TestClient
+from starlette import status
+from main import app
+from src.endpoints import imports
+import pytest
+
+client = TestClient(app)
+
+
+TASK_DATA = {
+    "title": "test",
+    "status": "todo",
+    "type": "mtg",
+    "man_hour_min": 1,
+    "to_date": "2023-08-14T15:32:00",
+    "from_date": "2023-08-14T15:32:00",
+    "priority": "test",
+    "project_id": "p1",
+}
+
+
+def test_import_ndjson_with_errors(new_user_headers, monkeypatch):
+    monkeypatch.setattr(imports, "IMPORT_BATCH_SIZE", 2)
+    lines = [json.dumps({**TASK_DATA, "title": f"task {i}"}) for i in range(4)]
+    lines.insert(1, "{not json")
+    lines.insert(3, json.dumps({**TASK_DATA, "title": None}))
+    files = {"file": ("tasks.ndjson", "\n".join(lines) + "\n")}
+
+    response = client.post("/imports", headers=new_user_headers, files=files)
+    assert response.status_code == status.HTTP_200_OK
+    job = response.json()
+    assert job["status"] == "done"
+    counts = (job["rows_processed"], job["rows_imported"], job["rows_failed"])
+    assert counts == (6, 4, 2)
+    assert [error["row"] for error in job["errors"]] == [2, 4]
+    assert job["errors"][1]["error"].startswith("title:")
+
+    titles = {t["title"] for t in client.get("/tasks", headers=new_user_headers).json()}
+    assert titles == {f"task {i}" for i in range(4)}
+
+    response = client.get("/imports/" + job["id"], headers=new_user_headers)
+    assert response.json()["rows_imported"] == 4
+
+
+def test_import_csv_resumes_after_committed_rows(new_user_headers, monkeypatch):
+    monkeypatch.setattr(imports, "IMPORT_BATCH_SIZE", 2)
+    rows = [{**TASK_DATA, "title": f"task {i}"} for i in range(5)]
+    lines = [",".join(TASK_DATA)] + [",".join(map(str, r.values())) for r in rows]
+    body = "\n".join(lines)
+    files = {"file": ("tasks.csv", body + "\n")}
+
+    # the process dies after committing the first batch
+    save_import_batch = imports.save_import_batch
+    job_ids = []
+
+    def interrupted(db_session, job_id, *args):
+        if job_ids:
+            raise RuntimeError("interrupted")
+        job_ids.append(job_id)
+        return save_import_batch(db_session, job_id, *args)
+
+    monkeypatch.setattr(imports, "save_import_batch", interrupted)
+    with pytest.raises(RuntimeError):
+        client.post("/imports", headers=new_user_headers, files=files)
+    job = client.get("/imports/" + job_ids[0], headers=new_user_headers).json()
+    progress = (job["status"], job["rows_processed"], job["format"])
+    assert progress == ("running", 2, "csv")
+
+    monkeypatch.setattr(imports, "save_import_batch", save_import_batch)
+    response = client.post(
+        "/imports?job_id=" + job_ids[0], headers=new_user_headers, files=files
+    )
+    job = response.json()
+    progress = (job["status"], job["rows_processed"], job["rows_imported"])
+    assert progress == ("done", 5, 5)
+    tasks = client.get("/tasks", headers=new_user_headers).json()
+    assert sorted(t["title"] for t in tasks) == [r["title"] for r in rows]
+
+    # resuming a finished job imports nothing more
+    response = client.post(
+        "/imports?job_id=" + job_ids[0], headers=new_user_headers, files=files
+    )
+    assert response.json()["rows_imported"] == 5
@@ -0,0 +1,26 @@
+from fastapi.testclient import TestClient
+from starlette import status
+from main import app
+from src.endpoints import metrics
+
+client = TestClient(app)
+
+ROUTES = ["pool", "auth", "cache", "events", "routes", "replicas"]
+
+
+def test_metrics_are_off_without_a_token(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "")
+    response = client.get("/metrics/pool", headers={"Authorization": "Bearer "})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_metrics_need_the_token(monkeypatch, new_user_headers):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "secret")
+    for route in ROUTES:
+        path = "/metrics/" + route
+        assert client.get(path).status_code == status.HTTP_401_UNAUTHORIZED
+        # a user's token isn't the metrics token
+        response = client.get(path, headers=new_user_headers)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        response = client.get(path, headers={"Authorization": "Bearer secret"})
+        assert response.status_code == status.HTTP_200_OK
@@ -86,3 +86,117 @@ def test_create_and_remove(headers, created_project):
     print(response.json())
     assert response.status_code == status.HTTP_200_OK
     assert response.json() == {"status": "OK"}
+
+
+def test_search_tasks_in_projects(new_user_headers):
+    task_data = {
+        "status": "todo",
+        "type": "mtg",
+        "man_hour_min": 30,
+        "to_date": "2023-08-14T15:32:00Z",
+        "from_date": "2023-08-14T15:32:00Z",
+        "priority": "high",
+    }
+    project_ids = []
+    for title in ["Backend", "Frontend"]:
+        response = client.post(
+            "/projects", headers=new_user_headers, json={**PROJECT_DATA, "title": title}
+        )
+        project_ids.append(response.json()["id"])
+    titles = [
+        ("Write report", project_ids[0]),
+        ("Review the report", project_ids[1]),
+        ("Deploy", project_ids[1]),
+    ]
+    for title, project_id in titles:
+        response = client.post(
+            "/tasks",
+            headers=new_user_headers,
+            json={**task_data, "title": title, "project_id": project_id},
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    response = client.get("/projects/tasks?title=REPORT", headers=new_user_headers)
+    assert response.status_code == status.HTTP_200_OK
+    projects = {p["title"]: [t["title"] for t in p["tasks"]] for p in response.json()}
+    assert projects == {"Backend": ["Write report"], "Frontend": ["Review the report"]}
+
+    # titles starting with the query rank first
+    response = client.get("/tasks/search?q=re", headers=new_user_headers)
+    assert [t["title"] for t in response.json()] == [
+        "Review the report",
+        "Write report",
+    ]
+
+
+def test_conditional_get_projects(new_user_headers):
+    response = client.post("/projects", headers=new_user_headers, json=PROJECT_DATA)
+    project_id = response.json()["id"]
+
+    for path in ["/projects", "/projects/tasks", "/projects/" + project_id]:
+        etag = client.get(path, headers=new_user_headers).headers["ETag"]
+        response = client.get(path, headers={**new_user_headers, "If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # adding a task to the project changes the listings
+    etag = client.get("/projects/tasks", headers=new_user_headers).headers["ETag"]
+    client.post(
+        "/tasks",
+        headers=new_user_headers,
+        json={
+            "title": "task",
+            "status": "todo",
+            "type": "mtg",
+            "man_hour_min": 30,
+            "to_date": "2023-08-14T15:32:00Z",
+            "from_date": "2023-08-14T15:32:00Z",
+            "priority": "high",
+            "project_id": project_id,
+        },
+    )
+    response = client.get(
+        "/projects/tasks", headers={**new_user_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()[0]["tasks"][0]["title"] == "task"
+
+
+def test_sparse_fields(new_user_headers):
+    response = client.post("/projects", headers=new_user_headers, json=PROJECT_DATA)
+    project_id = response.json()["id"]
+    client.post(
+        "/tasks",
+        headers=new_user_headers,
+        json={
+            "title": "task",
+            "status": "todo",
+            "type": "mtg",
+            "man_hour_min": 30,
+            "to_date": "2023-08-14T15:32:00Z",
+            "from_date": "2023-08-14T15:32:00Z",
+            "priority": "high",
+            "project_id": project_id,
+        },
+    )
+
+    response = client.get(
+        "/projects/tasks?fields=id,title,tasks&task_fields=id,title,status",
+        headers=new_user_headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    (project,) = response.json()
+    assert set(project) == {"id", "title", "tasks"}
+    assert [set(task) for task in project["tasks"]] == [{"id", "title", "status"}]
+
+    response = client.get("/projects?fields=title", headers=new_user_headers)
+    assert response.json() == [{"title": PROJECT_DATA["title"]}]
+
+    response = client.get("/tasks?fields=id,status", headers=new_user_headers)
+    assert [set(task) for task in response.json()] == [{"id", "status"}]
+
+    response = client.get("/projects?fields=title,password", headers=new_user_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    # the full listing is unaffected by the partial models
+    (project,) = client.get("/projects/tasks", headers=new_user_headers).json()
+    assert "updated_at" in project["tasks"][0]
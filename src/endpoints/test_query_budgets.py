@@ -0,0 +1,166 @@
+import uuid
+from typing import NamedTuple
+from fastapi.testclient import TestClient
+from main import app
+from db import engine
+from bench.seed import BENCH_PASSWORD, seed
+from src.endpoints.auth import bcrypt_context
+from src.utils import stats
+from src.utils.profiling import profile_observers
+import pytest
+
+client = TestClient(app)
+
+
+class Budget(NamedTuple):
+    statements: int
+    rows: int
+
+
+# the most SQL statements and rows loaded one request may take, on one
+# seeded user with SEED_PROJECTS projects of SEED_TASKS tasks each
+SEED_PROJECTS = 5
+SEED_TASKS = 20
+PAGE_SIZE = 10
+BUDGETS = {
+    "POST /auth/login": Budget(1, 1),
+    # the version of the list, then the page and one row to know there's more
+    "GET /tasks": Budget(2, 1 + PAGE_SIZE + 1),
+    # the versions of projects and tasks, the projects, then all their tasks
+    "GET /projects": Budget(3, 2 + SEED_PROJECTS + SEED_PROJECTS * SEED_TASKS),
+    "GET /projects/tasks": Budget(3, 2 + SEED_PROJECTS + SEED_PROJECTS * SEED_TASKS),
+    "POST /tasks": Budget(1, 0),
+    "PUT /tasks/{task_id}": Budget(1, 1),
+    # the task, its delete and its tombstone
+    "DELETE /tasks/{task_id}": Budget(3, 1),
+    # the bulk rows are for the two items the tests send
+    "POST /tasks/bulk": Budget(1, 0),
+    "PUT /tasks/bulk": Budget(2, 2),
+    "DELETE /tasks/bulk": Budget(3, 2),
+    "POST /projects": Budget(1, 0),
+    # the updated project, then its tasks for the response
+    "PUT /projects/{project_id}": Budget(2, 1 + SEED_TASKS),
+    # the project joined with its tasks, their update, the delete, the tombstone
+    "DELETE /projects/{project_id}": Budget(4, SEED_TASKS),
+}
+# with STATS_SUMMARY, task writes also read the old summary columns of the
+# tasks they change and upsert TaskSummary (edits to the same values don't)
+SUMMARY_BUDGETS = {
+    **BUDGETS,
+    "POST /tasks": Budget(2, 0),
+    "PUT /tasks/{task_id}": Budget(3, 2),
+    "DELETE /tasks/{task_id}": Budget(4, 1),
+    "POST /tasks/bulk": Budget(2, 0),
+    "PUT /tasks/bulk": Budget(4, 4),
+    "DELETE /tasks/bulk": Budget(5, 4),
+    "DELETE /projects/{project_id}": Budget(5, SEED_TASKS),
+}
+
+TASK_DATA = {
+    "title": "budget task",
+    "status": "todo",
+    "type": "dev",
+    "man_hour_min": 30,
+    "to_date": "2023-08-14T15:32:00",
+    "from_date": "2023-08-14T15:32:00",
+    "priority": "high",
+}
+PROJECT_DATA = {
+    "title": "budget project",
+    "status": "todo",
+    "to_date": "2023-08-14T15:32:00",
+    "from_date": "2023-08-14T15:32:00",
+}
+
+
+# one seeded user of its own, so the rows of the lists are known
+@pytest.fixture(scope="module")
+def seeded_username():
+    prefix = "budget-" + uuid.uuid4().hex
+    password_hash = bcrypt_context.hash(BENCH_PASSWORD)
+    (username,) = seed(engine, 1, SEED_PROJECTS, SEED_TASKS, password_hash, prefix)
+    return username
+
+
+@pytest.fixture(params=[False, True], ids=["summary-off", "summary-on"])
+def budget(request, seeded_username, monkeypatch):
+    """
+    Yields a checker that sends one request, compares what it took with the
+    budget of its route and collects the overruns, failing the test at the end.
+    Runs with STATS_SUMMARY off and on, whatever the environment sets.
+    """
+    monkeypatch.setattr(stats, "STATS_SUMMARY", request.param)
+    budgets = SUMMARY_BUDGETS if request.param else BUDGETS
+    profiles = []
+
+    def observe(route, profile):
+        profiles.append((route, profile))
+
+    overruns = []
+
+    def check(method: str, url: str, **kwargs):
+        profiles.clear()
+        response = client.request(method, url, **kwargs)
+        assert response.status_code < 400, response.text
+        route, profile = profiles[-1]
+        limit = budgets[route]
+        if profile.queries > limit.statements or profile.rows > limit.rows:
+            statements = "\n".join(
+                f"    {count}x {' '.join(statement.split())}"
+                for statement, count in profile.statements.items()
+            )
+            overruns.append(
+                f"{route}: {profile.queries} statements (budget {limit.statements}),"
+                f" {profile.rows} rows (budget {limit.rows})\n{statements}"
+            )
+        return response
+
+    profile_observers.append(observe)
+    try:
+        yield check
+    finally:
+        profile_observers.remove(observe)
+    assert not overruns, "query budget exceeded:\n" + "\n".join(overruns)
+
+
+def login(check, username: str) -> dict:
+    response = check(
+        "POST", "/auth/login", json={"username": username, "password": BENCH_PASSWORD}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_list_budgets(budget, seeded_username):
+    headers = login(budget, seeded_username)
+    budget("GET", f"/tasks?limit={PAGE_SIZE}", headers=headers)
+    budget("GET", "/projects", headers=headers)
+    budget("GET", "/projects/tasks", headers=headers)
+
+
+def test_task_write_budgets(budget, seeded_username):
+    headers = login(budget, seeded_username)
+    project_id = client.get("/projects", headers=headers).json()[0]["id"]
+    task = {**TASK_DATA, "project_id": project_id}
+
+    task_id = budget("POST", "/tasks", json=task, headers=headers).json()["id"]
+    budget("PUT", f"/tasks/{task_id}", json=task, headers=headers)
+    budget("DELETE", f"/tasks/{task_id}", headers=headers)
+
+    response = budget("POST", "/tasks/bulk", json=[task, task], headers=headers)
+    task_ids = [result["id"] for result in response.json()["results"]]
+    edits = [{**task, "id": task_id} for task_id in task_ids]
+    budget("PUT", "/tasks/bulk", json=edits, headers=headers)
+    budget("DELETE", "/tasks/bulk", json=task_ids, headers=headers)
+
+
+def test_project_write_budgets(budget, seeded_username):
+    headers = login(budget, seeded_username)
+    response = budget("POST", "/projects", json=PROJECT_DATA, headers=headers)
+    project_id = response.json()["id"]
+    budget("PUT", f"/projects/{project_id}", json=PROJECT_DATA, headers=headers)
+    budget("DELETE", f"/projects/{project_id}", headers=headers)
+
+    # a seeded project, with its tasks
+    project_id = client.get("/projects", headers=headers).json()[0]["id"]
+    budget("PUT", f"/projects/{project_id}", json=PROJECT_DATA, headers=headers)
+    budget("DELETE", f"/projects/{project_id}", headers=headers)
@@ -0,0 +1,132 @@
+from fastapi.testclient import TestClient
+from starlette import status
+from main import app
+from db import engine
+from src.utils import stats
+from src.utils.stats import rebuild_task_summaries
+
+client = TestClient(app)
+
+
+TASK_DATA = {
+    "title": "test",
+    "status": "todo",
+    "type": "mtg",
+    "man_hour_min": 30,
+    "to_date": "2023-08-14T15:32:00",
+    "from_date": "2023-08-14T15:32:00",
+    "priority": "high",
+}
+PROJECT_DATA = {
+    "title": "test",
+    "status": "test",
+    "to_date": "2023-08-14T15:32:00Z",
+    "from_date": "2023-08-14T15:32:00Z",
+}
+
+
+def get_stats(headers):
+    response = client.get("/stats", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    # groups come in no particular order
+    result = response.json()
+    for key, value in result.items():
+        if isinstance(value, list):
+            value.sort(key=lambda group: str(group["key"]))
+    return result
+
+
+def make_tasks(headers):
+    project = client.post("/projects", headers=headers, json=PROJECT_DATA).json()
+    tasks = [
+        {**TASK_DATA, "project_id": project["id"]},
+        {**TASK_DATA, "project_id": project["id"], "status": "done"},
+        {
+            **TASK_DATA,
+            "project_id": "other",
+            "priority": "low",
+            "to_date": "2999-01-01T00:00:00",
+        },
+    ]
+    results = client.post("/tasks/bulk", headers=headers, json=tasks).json()["results"]
+    return project, [result["id"] for result in results]
+
+
+def test_stats(new_user_headers):
+    project, _ = make_tasks(new_user_headers)
+    result = get_stats(new_user_headers)
+    assert (result["tasks"], result["man_hour_min"], result["overdue"]) == (3, 90, 1)
+    projects = {group["key"]: group["tasks"] for group in result["projects"]}
+    assert projects == {project["id"]: 2, "other": 1}
+    priorities = {group["key"]: group["man_hour_min"] for group in result["priorities"]}
+    assert priorities == {"high": 60, "low": 30}
+    statuses = {group["key"]: group["tasks"] for group in result["statuses"]}
+    assert statuses == {"todo": 2, "done": 1}
+
+
+def test_summary_follows_task_writes(new_user_headers, monkeypatch):
+    monkeypatch.setattr(stats, "STATS_SUMMARY", True)
+    with engine.begin() as connection:
+        rebuild_task_summaries(connection)
+
+    project, task_ids = make_tasks(new_user_headers)
+    client.put(
+        "/tasks/" + task_ids[0],
+        headers=new_user_headers,
+        json={**TASK_DATA, "status": "doing", "man_hour_min": 45, "project_id": "x"},
+    )
+    client.delete("/tasks/" + task_ids[1], headers=new_user_headers)
+    task_data = {**TASK_DATA, "project_id": project["id"]}
+    client.post("/tasks", headers=new_user_headers, json=task_data)
+    client.delete("/projects/" + project["id"], headers=new_user_headers)
+    summarized = get_stats(new_user_headers)
+
+    monkeypatch.setattr(stats, "STATS_SUMMARY", False)
+    assert summarized == get_stats(new_user_headers)
+    assert summarized["tasks"] == 3
+    assert {group["key"] for group in summarized["projects"]} == {"other", "x", None}
+
+
+def test_summary_counts_a_repeated_transition_once(new_user_headers, monkeypatch):
+    monkeypatch.setattr(stats, "STATS_SUMMARY", True)
+    with engine.begin() as connection:
+        rebuild_task_summaries(connection)
+
+    _, task_ids = make_tasks(new_user_headers)
+    edit = {**TASK_DATA, "status": "doing", "project_id": "x"}
+    # the second time the old values are the ones the first edit wrote
+    for _ in range(2):
+        path = "/tasks/" + task_ids[0]
+        response = client.put(path, headers=new_user_headers, json=edit)
+        assert response.status_code == status.HTTP_200_OK
+        bulk_edit = [{**edit, "id": task_ids[1]}]
+        response = client.put("/tasks/bulk", headers=new_user_headers, json=bulk_edit)
+        assert response.status_code == status.HTTP_200_OK
+    client.delete("/tasks/" + task_ids[0], headers=new_user_headers)
+    summarized = get_stats(new_user_headers)
+
+    monkeypatch.setattr(stats, "STATS_SUMMARY", False)
+    assert summarized == get_stats(new_user_headers)
+    statuses = {group["key"]: group["tasks"] for group in summarized["statuses"]}
+    assert statuses == {"doing": 1, "todo": 1}
+
+
+def test_summary_of_a_bulk_edit_repeating_an_id(new_user_headers, monkeypatch):
+    monkeypatch.setattr(stats, "STATS_SUMMARY", True)
+    with engine.begin() as connection:
+        rebuild_task_summaries(connection)
+
+    task_data = {**TASK_DATA, "project_id": "x"}
+    task = client.post("/tasks", headers=new_user_headers, json=task_data).json()
+    edits = [
+        {**task_data, "id": task["id"], "status": "done"},
+        {**task_data, "id": task["id"], "status": "doing"},
+    ]
+    response = client.put("/tasks/bulk", headers=new_user_headers, json=edits)
+    assert response.status_code == status.HTTP_200_OK
+    summarized = get_stats(new_user_headers)
+
+    monkeypatch.setattr(stats, "STATS_SUMMARY", False)
+    assert summarized == get_stats(new_user_headers)
+    statuses = {group["key"]: group["tasks"] for group in summarized["statuses"]}
+    assert (summarized["tasks"], statuses) == (1, {"doing": 1})
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from starlette import status
+from main import app
+from db import Tombstone, engine
+from src.endpoints import sync
+from src.utils.pagination import NEXT_CURSOR_HEADER
+
+client = TestClient(app)
+
+
+TASK_DATA = {
+    "title": "test",
+    "status": "test",
+    "type": "mtg",
+    "man_hour_min": 1,
+    "to_date": "2023-08-14T15:32:00",
+    "from_date": "2023-08-14T15:32:00",
+    "priority": "test",
+}
+PROJECT_DATA = {
+    "title": "test",
+    "status": "test",
+    "to_date": "2023-08-14T15:32:00Z",
+    "from_date": "2023-08-14T15:32:00Z",
+}
+
+
+def first_sync(headers, limit: int = 100) -> dict:
+    # follows the cursors of the pages, every page carries the same token
+    changes = {"tasks": [], "projects": [], "deleted": [], "tokens": set()}
+    path = f"/sync?limit={limit}"
+    while path:
+        response = client.get(path, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        page = response.json()
+        assert len(page["tasks"]) + len(page["projects"]) <= limit
+        for key in ("tasks", "projects", "deleted"):
+            changes[key] += page[key]
+        changes["tokens"].add(page["token"])
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        path = cursor and f"/sync?limit={limit}&cursor={cursor}"
+    return changes
+
+
+def test_sync_changes_and_deletes(new_user_headers, monkeypatch):
+    monkeypatch.setattr(sync, "SYNC_OVERLAP_SECONDS", 0)
+    response = client.post("/projects", headers=new_user_headers, json=PROJECT_DATA)
+    project = response.json()
+    kept, deleted = [
+        client.post(
+            "/tasks",
+            headers=new_user_headers,
+            json={**TASK_DATA, "project_id": project["id"]},
+        ).json()
+        for _ in range(2)
+    ]
+
+    changes = first_sync(new_user_headers)
+    assert {t["id"] for t in changes["tasks"]} == {kept["id"], deleted["id"]}
+    assert [p["id"] for p in changes["projects"]] == [project["id"]]
+    (token,) = changes["tokens"]
+
+    client.delete("/tasks/" + deleted["id"], headers=new_user_headers)
+    client.delete("/projects/" + project["id"], headers=new_user_headers)
+
+    changes = client.get("/sync?since=" + token, headers=new_user_headers).json()
+    # the remaining task was detached from the deleted project
+    tasks = [(t["id"], t["project_id"]) for t in changes["tasks"]]
+    assert tasks == [(kept["id"], None)]
+    assert changes["projects"] == []
+    assert {(d["entity"], d["id"]) for d in changes["deleted"]} == {
+        ("task", deleted["id"]),
+        ("project", project["id"]),
+    }
+
+    changes = client.get("/sync?since=" + changes["token"], headers=new_user_headers)
+    assert changes.json()["tasks"] == changes.json()["deleted"] == []
+
+
+def test_sync_with_invalid_token(new_user_headers):
+    response = client.get("/sync?since=not-a-token", headers=new_user_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_first_sync_pages(new_user_headers):
+    for _ in range(2):
+        response = client.post("/projects", headers=new_user_headers, json=PROJECT_DATA)
+    task_data = {**TASK_DATA, "project_id": response.json()["id"]}
+    task_ids = {
+        client.post("/tasks", headers=new_user_headers, json=task_data).json()["id"]
+        for _ in range(3)
+    }
+
+    changes = first_sync(new_user_headers, limit=2)
+    assert {t["id"] for t in changes["tasks"]} == task_ids
+    assert len(changes["projects"]) == 2
+    assert len(changes["tokens"]) == 1
+
+    response = client.get("/sync?cursor=not-a-cursor", headers=new_user_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_sync_after_the_retention_window(new_user_headers, monkeypatch):
+    monkeypatch.setattr(sync, "TOMBSTONE_RETENTION_DAYS", 1)
+    token = sync.encode_token(datetime.now() - timedelta(days=2))
+    response = client.get("/sync?since=" + token, headers=new_user_headers)
+    assert response.status_code == status.HTTP_410_GONE
+
+    task_data = {**TASK_DATA, "project_id": "other"}
+    task = client.post("/tasks", headers=new_user_headers, json=task_data).json()
+    client.delete("/tasks/" + task["id"], headers=new_user_headers)
+    # the tombstone is a day old when the purge runs
+    monkeypatch.setattr(sync, "TOMBSTONE_RETENTION_DAYS", -1)
+    with engine.begin() as connection:
+        assert sync.purge_tombstones(connection) >= 1
+        tombstones = connection.execute(
+            select(Tombstone).where(Tombstone.entity_id == task["id"])
+        )
+        assert tombstones.all() == []
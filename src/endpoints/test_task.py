@@ -1,5 +1,10 @@
+import uuid
+from datetime import datetime
 from fastapi.testclient import TestClient
+from jose import jwt
+from sqlalchemy import insert
 from starlette import status
+from db import Task, engine
 from main import app
 import pytest
 
@@ -84,3 +89,174 @@ def test_create_and_remove(headers, created_task):
     response = client.delete("/tasks/" + task_id, headers=headers)
     assert response.status_code == status.HTTP_200_OK
     assert response.json() == {"status": "OK"}
+
+
+def test_paginate_tasks(new_user_headers):
+    for _ in range(3):
+        response = client.post(
+            "/tasks", headers=new_user_headers, json={**TASK_DATA, "type": "mtg"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    response = client.get("/tasks?limit=2", headers=new_user_headers)
+    assert response.status_code == status.HTTP_200_OK
+    first_page = response.json()
+    assert len(first_page) == 2
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get("/tasks?limit=2&cursor=" + cursor, headers=new_user_headers)
+    assert response.status_code == status.HTTP_200_OK
+    second_page = response.json()
+    assert len(second_page) == 1
+    assert "X-Next-Cursor" not in response.headers
+    assert not {t["id"] for t in first_page} & {t["id"] for t in second_page}
+
+
+def test_paginate_tasks_with_invalid_cursor(new_user_headers):
+    response = client.get("/tasks?cursor=not-a-cursor", headers=new_user_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_bulk_create_update_and_delete(new_user_headers):
+    response = client.post(
+        "/tasks/bulk",
+        headers=new_user_headers,
+        json=[{**TASK_DATA, "type": "mtg", "title": f"bulk {i}"} for i in range(3)],
+    )
+    assert response.status_code == status.HTTP_200_OK
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["created"] * 3
+    task_ids = [r["id"] for r in results]
+
+    edits = [
+        {**EDIT_TASK_DATA, "type": "mtg", "id": task_id} for task_id in task_ids[:2]
+    ]
+    edits.append({**EDIT_TASK_DATA, "type": "mtg", "id": "missing"})
+    response = client.put("/tasks/bulk", headers=new_user_headers, json=edits)
+    assert response.status_code == status.HTTP_200_OK
+    statuses = [r["status"] for r in response.json()["results"]]
+    assert statuses == ["updated", "updated", "not_found"]
+    response = client.get("/tasks/" + task_ids[0], headers=new_user_headers)
+    assert response.json()["title"] == EDIT_TASK_DATA["title"]
+
+    response = client.request(
+        "DELETE", "/tasks/bulk", headers=new_user_headers, json=task_ids + ["missing"]
+    )
+    assert response.status_code == status.HTTP_200_OK
+    statuses = [r["status"] for r in response.json()["results"]]
+    assert statuses == ["deleted"] * 3 + ["not_found"]
+    assert client.get("/tasks", headers=new_user_headers).json() == []
+
+
+def test_cached_tasks_follow_writes(new_user_headers):
+    assert client.get("/tasks", headers=new_user_headers).json() == []
+    # served from the cache until a write of the user
+    assert client.get("/tasks", headers=new_user_headers).json() == []
+
+    response = client.post(
+        "/tasks", headers=new_user_headers, json={**TASK_DATA, "type": "mtg"}
+    )
+    task_id = response.json()["id"]
+    tasks = client.get("/tasks", headers=new_user_headers).json()
+    assert [t["id"] for t in tasks] == [task_id]
+
+    client.put(
+        "/tasks/" + task_id,
+        headers=new_user_headers,
+        json={**EDIT_TASK_DATA, "type": "mtg"},
+    )
+    tasks = client.get("/tasks", headers=new_user_headers).json()
+    assert tasks[0]["title"] == EDIT_TASK_DATA["title"]
+
+    client.delete("/tasks/" + task_id, headers=new_user_headers)
+    assert client.get("/tasks", headers=new_user_headers).json() == []
+
+
+def test_cached_tasks_follow_the_version(new_user_headers):
+    assert client.get("/tasks", headers=new_user_headers).json() == []
+
+    # a write by another worker: the data changes, this process's cache isn't told
+    token = new_user_headers["Authorization"].split()[1]
+    user_id = jwt.get_unverified_claims(token)["id"]
+    now = datetime.now()
+    with engine.begin() as connection:
+        connection.execute(
+            insert(Task),
+            {
+                **TASK_DATA,
+                "type": "mtg",
+                "from_date": now,
+                "to_date": now,
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "created_at": now,
+                "updated_at": now,
+            },
+        )
+
+    response = client.get("/tasks", headers=new_user_headers)
+    assert len(response.json()) == 1
+    etag = response.headers["ETag"]
+    response = client.get("/tasks", headers={**new_user_headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+def test_conditional_get_tasks(new_user_headers):
+    response = client.get("/tasks", headers=new_user_headers)
+    etag = response.headers["ETag"]
+    response = client.get("/tasks", headers={**new_user_headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+
+    response = client.post(
+        "/tasks", headers=new_user_headers, json={**TASK_DATA, "type": "mtg"}
+    )
+    task_id = response.json()["id"]
+    response = client.get("/tasks", headers={**new_user_headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+
+    response = client.get("/tasks/" + task_id, headers=new_user_headers)
+    etag = response.headers["ETag"]
+    response = client.get(
+        "/tasks/" + task_id, headers={**new_user_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+def test_tasks_in_range_and_calendar(new_user_headers):
+    period = {
+        **TASK_DATA,
+        "type": "mtg",
+        "from_date": "2023-08-30T09:00:00",
+        "to_date": "2023-09-02T18:00:00",
+        "man_hour_min": 40,
+    }
+    response = client.post("/tasks", headers=new_user_headers, json=period)
+    task_id = response.json()["id"]
+
+    response = client.get(
+        "/tasks?from=2023-09-01T00:00:00&to=2023-09-30T23:59:59",
+        headers=new_user_headers,
+    )
+    assert [t["id"] for t in response.json()] == [task_id]
+    response = client.get(
+        "/tasks?from=2023-09-03T00:00:00&to=2023-09-30T23:59:59",
+        headers=new_user_headers,
+    )
+    assert response.json() == []
+
+    response = client.get(
+        "/tasks/calendar?from=2023-09-01&to=2023-09-03", headers=new_user_headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [
+        {"day": "2023-09-01", "tasks": 1, "man_hour_min": 10.0},
+        {"day": "2023-09-02", "tasks": 1, "man_hour_min": 10.0},
+        {"day": "2023-09-03", "tasks": 0, "man_hour_min": 0.0},
+    ]
+
+    response = client.get(
+        "/tasks/calendar?from=2023-09-03&to=2023-09-01", headers=new_user_headers
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
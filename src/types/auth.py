@@ -35,3 +35,12 @@ class TaskEditRequest(BaseModel):
 
 class SimpleResponse(BaseModel):
     status: str = Field(..., example="ok")
+
+
+class UserGetResponse(BaseModel):
+    # never the password hash
+    id: str = Field(..., example="32ed23f32f2311")
+    username: str = Field(..., example="Test user")
+    email: str = Field(None, example="fefre@gmail.com")
+    created_at: datetime = Field(..., example="2023-08-14T15:32:00Z")
+    updated_at: datetime = Field(..., example="2023-08-14T15:32:00Z")
@@ -0,0 +1,20 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+
+
+class ImportRowError(BaseModel):
+    row: int = Field(..., example=3)
+    error: str = Field(..., example="title: Field required")
+
+
+class ImportJobResponse(BaseModel):
+    id: str = Field(..., example="32ed23f32f2311")
+    filename: str = Field(None, example="tasks.csv")
+    format: str = Field(..., example="csv")
+    status: str = Field(..., example="done")
+    rows_processed: int = Field(..., example=1000)
+    rows_imported: int = Field(..., example=998)
+    rows_failed: int = Field(..., example=2)
+    errors: list[ImportRowError]
+    created_at: datetime
+    updated_at: datetime
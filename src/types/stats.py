@@ -0,0 +1,18 @@
+from pydantic import BaseModel, Field
+
+
+class GroupStats(BaseModel):
+    # None for the tasks without a value, e.g. without project
+    key: str | None = Field(..., example="32ed23f32f2311")
+    tasks: int = Field(..., example=12)
+    man_hour_min: int = Field(..., example=720)
+
+
+class StatsResponse(BaseModel):
+    tasks: int = Field(..., example=40)
+    man_hour_min: int = Field(..., example=2400)
+    overdue: int = Field(..., example=3)
+    projects: list[GroupStats]
+    statuses: list[GroupStats]
+    priorities: list[GroupStats]
+    types: list[GroupStats]
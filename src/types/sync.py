@@ -0,0 +1,27 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from src.types.task import TaskGetResponse
+
+
+# Projects are synced without their tasks, which come in SyncResponse.tasks
+class SyncProjectResponse(BaseModel):
+    id: str = Field(..., example="32ed23f32f2311")
+    title: str = Field(..., example="Test project")
+    status: str = Field(..., example="pending")
+    to_date: datetime = Field(..., example="2023-08-15T15:32:00Z")
+    from_date: datetime = Field(..., example="2023-08-14T15:32:00Z")
+    created_at: datetime = Field(..., example="2023-08-14T15:32:00Z")
+    updated_at: datetime = Field(..., example="2023-08-14T15:32:00Z")
+
+
+class DeletedResponse(BaseModel):
+    entity: str = Field(..., example="task")
+    id: str = Field(..., example="32ed23f32f2311")
+    deleted_at: datetime = Field(..., example="2023-08-14T15:32:00Z")
+
+
+class SyncResponse(BaseModel):
+    tasks: list[TaskGetResponse]
+    projects: list[SyncProjectResponse]
+    deleted: list[DeletedResponse]
+    token: str = Field(..., example="MjAyMy0wOC0xNFQxNTozMjowMA")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from datetime import datetime
+from datetime import date, datetime
 
 
 # Pydanticを用いたAPIに渡されるデータの定義 ValidationやDocumentationの機能が追加される
@@ -25,7 +25,8 @@ class TaskGetResponse(BaseModel):
     to_date: datetime = Field(..., example="2023-08-15T15:32:00Z")
     from_date: datetime = Field(..., example="2023-08-14T15:32:00Z")
     priority: str = Field(..., example="critical")
-    project_id: str = Field(..., example="32ed23f32f2311")
+    # None once the project of the task is deleted
+    project_id: str | None = Field(..., example="32ed23f32f2311")
 
     created_at: datetime
     updated_at: datetime
@@ -42,5 +43,26 @@ class TaskEditRequest(BaseModel):
     project_id: str = Field(..., example="32ed23f32f2311")
 
 
+class TaskBulkEditRequest(TaskEditRequest):
+    id: str = Field(..., example="32ed23f32f2311")
+
+
+class BulkItemResult(BaseModel):
+    id: str = Field(..., example="32ed23f32f2311")
+    status: str = Field(..., example="created")
+
+
+class BulkResponse(BaseModel):
+    # one result per item, in the order of the request
+    results: list[BulkItemResult]
+
+
+class CalendarDay(BaseModel):
+    day: date = Field(..., example="2023-08-14")
+    tasks: int = Field(..., example=3)
+    # the share of the man_hour_min of each task that falls on this day
+    man_hour_min: float = Field(..., example=90.0)
+
+
 class SimpleResponse(BaseModel):
     status: str = Field(..., example="ok")
@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from fastapi import Response
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# memory: LRU in each process (fine for a single worker)
+# redis: shared by all workers and Lambda containers, needs the redis package
+# none: no caching
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+# seconds a response is served at most, bounds staleness across processes
+CACHE_TTL = float(os.getenv("CACHE_TTL", "30"))
+
+
+class MemoryBackend:
+    """
+    In-process LRU of bytes with per-entry expiry.
+    """
+
+    blocking = False
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        # key -> (expires at, value)
+        self.entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    def get(self, key: str) -> bytes | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: float | None = None, nx=False):
+        expires_at = time.monotonic() + ttl if ttl else float("inf")
+        with self.lock:
+            if nx and key in self.entries:
+                return
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class RedisBackend:
+    """
+    Stores entries in Redis, or anything with the get/set(ex, nx) API of a
+    redis.Redis client.
+    """
+
+    # calls go through the threadpool so a slow Redis doesn't stall the event loop
+    blocking = True
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float | None = None, nx=False):
+        self.client.set(key, value, ex=int(ttl) if ttl else None, nx=nx)
+
+    def __len__(self):
+        return self.client.dbsize()
+
+
+class ResponseCache:
+    """
+    Read-through cache of JSON list responses, per user and query.
+
+    Entries are grouped in namespaces ("tasks", "projects") and keyed by a
+    version of (namespace, user). invalidate() gives the pair a new random
+    version, so every response cached for that user and namespace is
+    skipped from then on and ages out of the backend.
+    """
+
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def version_key(self, user_id: str, namespace: str) -> str:
+        return f"version:{namespace}:{user_id}"
+
+    def version(self, user_id: str, namespace: str) -> str:
+        key = self.version_key(user_id, namespace)
+        version = self.backend.get(key)
+        if version is None:
+            # a random first version never matches entries of an evicted one
+            self.backend.set(key, uuid.uuid4().hex.encode(), nx=True)
+            version = self.backend.get(key)
+        return version.decode() if isinstance(version, bytes) else version
+
+    def key(self, user_id: str, namespace: str, params: dict) -> str:
+        query = json.dumps(params, sort_keys=True, default=str).encode()
+        return "response:{}:{}:{}:{}".format(
+            namespace,
+            user_id,
+            self.version(user_id, namespace),
+            hashlib.sha1(query).hexdigest(),
+        )
+
+    def lookup(self, user_id: str, namespace: str, params: dict):
+        key = self.key(user_id, namespace, params)
+        entry = self.backend.get(key)
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return key, entry
+
+    def store(self, key: str, body: bytes, headers: dict):
+        # headers and body are kept in one value, separated by a newline
+        self.backend.set(key, json.dumps(headers).encode() + b"\n" + body, self.ttl)
+
+    async def fetch(self, user_id: str, namespace: str, params: dict, load):
+        """
+        Returns the cached response of (user, namespace, params), or awaits
+        load() for it and caches the result.
+
+        Parameters:
+            - load: An async function returning (body bytes, headers dict).
+
+        Returns:
+            - Response: The JSON body with its headers.
+        """
+        if self.backend.blocking:
+            key, entry = await run_in_threadpool(
+                self.lookup, user_id, namespace, params
+            )
+        else:
+            key, entry = self.lookup(user_id, namespace, params)
+
+        if entry is None:
+            body, headers = await load()
+            if self.backend.blocking:
+                await run_in_threadpool(self.store, key, body, headers)
+            else:
+                self.store(key, body, headers)
+        else:
+            raw_headers, body = entry.split(b"\n", 1)
+            headers = json.loads(raw_headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def bump_versions(self, user_id: str, namespaces: tuple):
+        for namespace in namespaces:
+            self.backend.set(
+                self.version_key(user_id, namespace), uuid.uuid4().hex.encode()
+            )
+        with self.lock:
+            self.invalidations += 1
+
+    async def invalidate(self, user_id: str, *namespaces: str):
+        """
+        Drops every response cached for the user in the given namespaces.
+        """
+        if self.backend.blocking:
+            await run_in_threadpool(self.bump_versions, user_id, namespaces)
+        else:
+            self.bump_versions(user_id, namespaces)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": type(self.backend).__name__,
+                "entries": len(self.backend),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+class NoCache(ResponseCache):
+    def __init__(self):
+        super().__init__(MemoryBackend(0), 0)
+
+    async def fetch(self, user_id: str, namespace: str, params: dict, load):
+        body, headers = await load()
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def invalidate(self, user_id: str, *namespaces: str):
+        pass
+
+
+def create_response_cache() -> ResponseCache:
+    """
+    Builds the cache selected by CACHE_BACKEND.
+    """
+    if CACHE_BACKEND == "none":
+        return NoCache()
+    if CACHE_BACKEND == "redis":
+        # optional dependency, only needed with this backend
+        import redis
+
+        return ResponseCache(
+            RedisBackend(redis.Redis.from_url(CACHE_REDIS_URL)), CACHE_TTL
+        )
+    return ResponseCache(MemoryBackend(CACHE_MAX_ENTRIES), CACHE_TTL)
+
+
+response_cache = create_response_cache()
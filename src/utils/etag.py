@@ -0,0 +1,29 @@
+import hashlib
+import json
+from fastapi import Response
+from starlette import status
+
+
+def make_etag(*parts) -> str:
+    """
+    Builds a weak ETag from anything that determines a response body,
+    e.g. the row count and latest updated_at of the rows plus the query.
+    """
+    digest = hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Whether the If-None-Match header of a request lists etag (weak comparison).
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in (
+        tag.removeprefix("W/") for tag in tags
+    )
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
@@ -0,0 +1,213 @@
+import os
+import json
+import asyncio
+import logging
+from datetime import datetime
+from sqlalchemy.engine import make_url
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# local: events reach the streams of this process only
+# postgres: events go through LISTEN/NOTIFY to the streams of every worker
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "local")
+# events buffered per stream, a client that falls further behind must resync
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+# open streams allowed per user and process
+EVENTS_MAX_STREAMS = int(os.getenv("EVENTS_MAX_STREAMS", "5"))
+EVENTS_CHANNEL = "task_management_events"
+# NOTIFY payloads must be shorter than 8000 bytes in a default Postgres build
+NOTIFY_MAX_BYTES = 7900
+
+# sent instead of the dropped events when a stream overflows
+RESYNC_EVENT = {"entity": None, "op": "resync", "ids": [], "at": None}
+
+
+class TooManyStreams(Exception):
+    pass
+
+
+def encode_resync(user_id: str) -> str:
+    return json.dumps({"user_id": user_id, "event": RESYNC_EVENT})
+
+
+def notify_payloads(user_id: str, event: dict, max_bytes: int = NOTIFY_MAX_BYTES):
+    """
+    Encodes event as NOTIFY payloads of at most max_bytes, splitting its ids
+    across several events when they don't fit in one, e.g. bulk writes of
+    a thousand tasks. An id too long for any payload turns it into a resync.
+
+    Returns:
+        - list[str]: The payloads, to send in order.
+    """
+
+    def encode(ids: list) -> str:
+        return json.dumps({"user_id": user_id, "event": {**event, "ids": ids}})
+
+    # the encoding is ASCII, characters are bytes. ids are joined by ", "
+    base = len(encode([]))
+    payloads, chunk, size = [], [], base
+    for id_ in event["ids"]:
+        item = len(json.dumps(id_))
+        if base + item > max_bytes:
+            return [encode_resync(user_id)]
+        if chunk and size + 2 + item > max_bytes:
+            payloads.append(encode(chunk))
+            chunk, size = [], base
+        size += item + (2 if chunk else 0)
+        chunk.append(id_)
+    payloads.append(encode(chunk))
+    return payloads
+
+
+class Subscription:
+    """
+    The events of one user for one open stream, bounded to maxsize.
+    """
+
+    def __init__(self, user_id: str, maxsize: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def put(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # never block publishers on a slow client, make it reload instead
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_EVENT)
+
+    async def get(self, timeout: float) -> dict | None:
+        """
+        Waits for the next event, returns None after timeout seconds without one.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Broker:
+    """
+    Fans task and project mutations out to the open streams of their user.
+
+    publish() is called from the write endpoints. With a Postgres DSN,
+    events are sent with NOTIFY and every worker, this one included,
+    delivers them to its streams from a LISTEN connection.
+    """
+
+    def __init__(self, queue_size: int, max_streams: int, dsn: str | None = None):
+        self.queue_size = queue_size
+        self.max_streams = max_streams
+        self.dsn = dsn
+        self.subscriptions: dict[str, set[Subscription]] = {}
+        self.listener = None
+        self.sender = None
+        self.send_lock = asyncio.Lock()
+        # keeps the pending NOTIFY tasks from being garbage collected
+        self.pending: set[asyncio.Task] = set()
+        self.published = 0
+
+    async def start(self):
+        if self.dsn is None:
+            return
+        # asyncpg is only needed with the postgres backend
+        import asyncpg
+
+        self.listener = await asyncpg.connect(self.dsn)
+        await self.listener.add_listener(EVENTS_CHANNEL, self.on_notify)
+        self.sender = await asyncpg.connect(self.dsn)
+
+    async def stop(self):
+        for connection in (self.listener, self.sender):
+            if connection is not None:
+                await connection.close()
+        self.listener = self.sender = None
+
+    def can_subscribe(self, user_id: str) -> bool:
+        return len(self.subscriptions.get(user_id, ())) < self.max_streams
+
+    def subscribe(self, user_id: str) -> Subscription:
+        if not self.can_subscribe(user_id):
+            raise TooManyStreams(user_id)
+        subscriptions = self.subscriptions.setdefault(user_id, set())
+        subscription = Subscription(user_id, self.queue_size)
+        subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self.subscriptions.get(subscription.user_id, set())
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            self.subscriptions.pop(subscription.user_id, None)
+
+    def deliver(self, user_id: str, event: dict):
+        for subscription in self.subscriptions.get(user_id, ()):
+            subscription.put(event)
+
+    def on_notify(self, connection, pid, channel, payload):
+        message = json.loads(payload)
+        self.deliver(message["user_id"], message["event"])
+
+    async def notify(self, payloads: list[str]):
+        try:
+            async with self.send_lock:
+                for payload in payloads:
+                    await self.sender.execute(
+                        "SELECT pg_notify($1, $2)", EVENTS_CHANNEL, payload
+                    )
+        except Exception:
+            # the write succeeded, a lost event only delays clients until they resync
+            logger.exception("failed to send an event")
+
+    def publish(self, user_id: str, entity: str, op: str, ids: list[str]):
+        """
+        Sends {entity, op, ids, at} to the streams of the user.
+
+        Parameters:
+            - entity (str): "task" or "project".
+            - op (str): "created", "updated", "deleted", or "imported" for
+              the tasks of an import job.
+            - ids (list[str]): The ids of the rows that changed, the id of
+              the job for "imported".
+        """
+        at = datetime.now().isoformat()
+        event = {"entity": entity, "op": op, "ids": ids, "at": at}
+        self.published += 1
+        if self.sender is None:
+            self.deliver(user_id, event)
+            return
+
+        task = asyncio.get_running_loop().create_task(
+            self.notify(notify_payloads(user_id, event))
+        )
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    def stats(self) -> dict:
+        streams = [s for subs in self.subscriptions.values() for s in subs]
+        return {
+            "backend": "postgres" if self.dsn else "local",
+            "users": len(self.subscriptions),
+            "streams": len(streams),
+            "published": self.published,
+            "queued": sum(s.queue.qsize() for s in streams),
+            "dropped": sum(s.dropped for s in streams),
+        }
+
+
+def create_broker() -> Broker:
+    dsn = None
+    if EVENTS_BACKEND == "postgres":
+        # asyncpg takes the libpq form of the URI, without the +driver suffix
+        url = make_url(os.getenv("SQLALCHEMY_DATABASE_URI"))
+        dsn = url.set(drivername="postgresql").render_as_string(hide_password=False)
+    return Broker(EVENTS_QUEUE_SIZE, EVENTS_MAX_STREAMS, dsn)
+
+
+broker = create_broker()
@@ -0,0 +1,56 @@
+from copy import copy
+from functools import lru_cache
+from fastapi import HTTPException
+from pydantic import BaseModel, create_model
+from starlette import status
+
+
+def parse_fields(model, fields: str | None) -> tuple[str, ...] | None:
+    """
+    Parses a comma-separated ?fields= value into field names of model.
+
+    Returns:
+        - tuple[str, ...] | None: The names in the order of the model, so the
+          same set always gives the same tuple, or None for every field.
+
+    Raises:
+        - HTTPException(400): A name is not a field of model.
+    """
+    if not fields:
+        return None
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names - model.model_fields.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown fields: " + ", ".join(sorted(unknown)),
+        )
+    return tuple(name for name in model.model_fields if name in names)
+
+
+@lru_cache
+def partial_model(
+    model, fields: tuple[str, ...] | None, nested: tuple = ()
+) -> type[BaseModel]:
+    """
+    Returns a copy of model with only the given fields, model itself when
+    fields is None and nothing is nested.
+
+    Parameters:
+        - fields (tuple[str, ...]): Field names as returned by parse_fields.
+        - nested (tuple): (name, annotation) pairs replacing the type of list
+          fields, e.g. ("tasks", list[partial task model]).
+    """
+    if fields is None and not nested:
+        return model
+    # create_model sets the annotation of the FieldInfos it's given, copies
+    # keep the fields of model as they are
+    definitions = {
+        name: (info.annotation, copy(info))
+        for name, info in model.model_fields.items()
+        if fields is None or name in fields
+    }
+    for name, annotation in nested:
+        if name in definitions:
+            definitions[name] = (annotation, definitions[name][1])
+    return create_model(model.__name__ + "Fields", **definitions)
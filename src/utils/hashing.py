@@ -0,0 +1,63 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from starlette import status
+
+
+class PasswordHasher:
+    """
+    Runs the bcrypt hashes of a passlib CryptContext on a dedicated,
+    size-limited thread pool instead of the event loop.
+
+    bcrypt releases the GIL, so the worker threads hash in parallel. When
+    workers + queue_size hashes are already running or waiting, new calls
+    fail fast with 503 instead of piling up behind a login burst.
+    """
+
+    def __init__(self, context, workers: int, queue_size: int):
+        self.context = context
+        self.capacity = workers + queue_size
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hash"
+        )
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+
+    async def run(self, func, *args):
+        with self.lock:
+            if self.pending >= self.capacity:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many login requests, retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+        try:
+            return await asyncio.wrap_future(self.executor.submit(func, *args))
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self.run(self.context.hash, password)
+
+    async def verify_and_update(
+        self, password: str, hashed: str
+    ) -> tuple[bool, str | None]:
+        """
+        Returns:
+            - tuple[bool, str | None]: Whether password matches, and a new hash
+              when the stored one was made with another cost than the current one.
+        """
+        return await self.run(self.context.verify_and_update, password, hashed)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "capacity": self.capacity,
+                "pending": self.pending,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,75 @@
+import os
+import json
+import base64
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from starlette import status
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Page size used when a client doesn't send ?limit=
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+# Response header that carries the cursor of the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(updated_at: datetime, row_id: str) -> str:
+    """
+    Encodes the position of the last row of a page into an opaque cursor.
+    """
+    raw = json.dumps([updated_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """
+    Decodes a cursor created by encode_cursor.
+
+    Raises:
+        - HTTPException(400): The cursor was not issued by this API.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(updated_at), str(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def paginate(query, model, cursor: str | None, limit: int):
+    """
+    Returns one page of query ordered by (updated_at, id), newest first.
+
+    The cursor is compared with a row value instead of an OFFSET, so the
+    database seeks straight to the page through the (user_id, updated_at, id)
+    index no matter how deep the page is.
+
+    Parameters:
+        - query: A Query over model, already filtered by user.
+        - model: The mapped class that has updated_at and id columns.
+        - cursor (str): The cursor of the previous page, or None for the first page.
+        - limit (int): The maximum number of rows in the page.
+
+    Returns:
+        - tuple[list, str | None]: The rows and the cursor of the next page,
+          None when this is the last page.
+    """
+    if cursor:
+        updated_at, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.updated_at, model.id) < (updated_at, row_id))
+
+    # fetch one extra row to know whether another page exists
+    rows = (
+        query.order_by(model.updated_at.desc(), model.id.desc()).limit(limit + 1).all()
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].updated_at, rows[-1].id)
+    return rows, next_cursor
@@ -0,0 +1,95 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import and_, func, select, text
+from sqlalchemy.orm import Session
+from db import Task
+
+
+def create_period_index(connection):
+    """
+    Creates the index of the from_date..to_date periods of tasks of the
+    database of connection: a GiST index of tsranges on Postgres, (user_id,
+    from_date) and (user_id, to_date) B-trees elsewhere.
+    """
+    if connection.dialect.name == "postgresql":
+        # btree_gist lets user_id be part of the GiST index
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+        connection.execute(
+            text(
+                'CREATE INDEX IF NOT EXISTS "ix_Task_user_id_period" ON "Task" '
+                "USING gist (user_id, tsrange(least(from_date, to_date), "
+                "greatest(from_date, to_date), '[]'))"
+            )
+        )
+    else:
+        for column in ("from_date", "to_date"):
+            connection.execute(
+                text(
+                    f'CREATE INDEX IF NOT EXISTS "ix_Task_user_id_{column}" '
+                    f'ON "Task" (user_id, {column})'
+                )
+            )
+
+
+def overlaps(dialect: str, date_from: datetime | None, date_to: datetime | None):
+    """
+    Returns the clause selecting the tasks whose from_date..to_date period
+    overlaps date_from..date_to (bounds included, None is unbounded).
+    """
+    if dialect == "postgresql":
+        # the same expression as ix_Task_user_id_period, so the index is used
+        period = func.tsrange(
+            func.least(Task.from_date, Task.to_date),
+            func.greatest(Task.from_date, Task.to_date),
+            "[]",
+        )
+        return period.op("&&")(func.tsrange(date_from, date_to, "[]"))
+
+    clauses = []
+    if date_from is not None:
+        clauses.append(Task.to_date >= date_from)
+    if date_to is not None:
+        clauses.append(Task.from_date <= date_to)
+    return and_(*clauses)
+
+
+def bucket_by_day(db_session: Session, user_id: str, first: date, last: date):
+    """
+    Counts the user's tasks active on each day from first to last.
+
+    The man_hour_min of a task is spread evenly over the days of its
+    period, so the days of consecutive months add up to its total.
+
+    Returns:
+        - list[dict]: {day, tasks, man_hour_min} per day, days without
+          tasks included.
+    """
+    date_from = datetime.combine(first, datetime.min.time())
+    date_to = datetime.combine(last, datetime.max.time())
+    dialect = db_session.get_bind().dialect.name
+    # only the three columns needed, no Task objects
+    rows = db_session.execute(
+        select(Task.from_date, Task.to_date, Task.man_hour_min).where(
+            Task.user_id == user_id, overlaps(dialect, date_from, date_to)
+        )
+    )
+
+    days = (last - first).days + 1
+    counts = [0] * days
+    hours = [0.0] * days
+    for from_date, to_date, man_hour_min in rows:
+        start, end = sorted((from_date.date(), to_date.date()))
+        per_day = (man_hour_min or 0) / ((end - start).days + 1)
+        for offset in range(
+            max((start - first).days, 0), min((end - first).days, days - 1) + 1
+        ):
+            counts[offset] += 1
+            hours[offset] += per_day
+
+    return [
+        {
+            "day": first + timedelta(days=offset),
+            "tasks": counts[offset],
+            "man_hour_min": round(hours[offset], 2),
+        }
+        for offset in range(days)
+    ]
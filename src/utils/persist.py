@@ -0,0 +1,55 @@
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+
+def commit_keeping_state(db_session: Session):
+    """
+    Commits without expiring the objects of the session, so returning them
+    afterwards doesn't trigger a SELECT to reload what was just written.
+    """
+    expire_on_commit = db_session.expire_on_commit
+    db_session.expire_on_commit = False
+    try:
+        db_session.commit()
+    finally:
+        db_session.expire_on_commit = expire_on_commit
+
+
+def save(db_session: Session, obj):
+    """
+    Inserts obj and returns it as stored in one round trip. Every column,
+    id and timestamps included, is set by the caller, so nothing needs to
+    be read back from the database.
+    """
+    db_session.add(obj)
+    commit_keeping_state(db_session)
+    return obj
+
+
+def update_returning(db_session: Session, model, criteria: list, values: dict):
+    """
+    Updates the row of model matching criteria and returns it as stored.
+
+    Databases that support UPDATE ... RETURNING (Postgres, SQLite >= 3.35)
+    do it in a single statement, others load the row, change it and commit
+    without expiring it.
+
+    Parameters:
+        - model: The mapped class to update.
+        - criteria (list): WHERE clauses that select a single row.
+        - values (dict): The columns to overwrite.
+
+    Returns:
+        - The updated object, or None when no row matched.
+    """
+    if db_session.get_bind().dialect.update_returning:
+        obj = db_session.scalars(
+            update(model).where(*criteria).values(**values).returning(model)
+        ).first()
+    else:
+        obj = db_session.query(model).filter(*criteria).first()
+        for key, value in (values.items() if obj else ()):
+            setattr(obj, key, value)
+
+    commit_keeping_state(db_session)
+    return obj
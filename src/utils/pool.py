@@ -0,0 +1,100 @@
+import threading
+from time import perf_counter
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+
+class PoolStats:
+    """
+    Counters of one connection pool, shown by GET /metrics/pool.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked_out = 0
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float):
+        with self.lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def add(self, counter: str, amount: int = 1):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def snapshot(self, pool) -> dict:
+        """
+        Parameters:
+            - pool (Pool): The pool these stats belong to.
+
+        Returns:
+            - dict: Current gauges of the pool and the counters since startup.
+              Gauges that the pool class doesn't track, such as the idle
+              connections of a NullPool, are None.
+        """
+        with self.lock:
+            checkouts = self.checkouts
+            return {
+                "pool": type(pool).__mro__[1].__name__,
+                "size": _gauge(pool, "size"),
+                "idle": _gauge(pool, "checkedin"),
+                # QueuePool counts overflow from -pool_size, only report the excess
+                "overflow": max(_gauge(pool, "overflow") or 0, 0),
+                "checked_out": self.checked_out,
+                "checkouts": checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": self.wait_total / checkouts * 1000 if checkouts else 0.0,
+                "wait_max_ms": self.wait_max * 1000,
+            }
+
+
+def _gauge(pool, name: str):
+    method = getattr(pool, name, None)
+    return method() if callable(method) else None
+
+
+def metered_pool_class(base, stats: PoolStats):
+    """
+    Subclasses a SQLAlchemy pool class so that every checkout is timed.
+
+    Parameters:
+        - base (type[Pool]): QueuePool, AsyncAdaptedQueuePool, NullPool, ...
+        - stats (PoolStats): Where the measurements go.
+
+    Returns:
+        - type[Pool]: The class to pass as poolclass to create_engine.
+    """
+
+    class MeteredPool(base):
+        def connect(self):
+            start = perf_counter()
+            try:
+                return super().connect()
+            except PoolTimeoutError:
+                stats.add("timeouts")
+                raise
+            finally:
+                stats.record_wait(perf_counter() - start)
+
+    return MeteredPool
+
+
+def watch_pool_events(engine, stats: PoolStats):
+    """
+    Counts connects, checkouts and invalidations of the pool of a sync engine
+    (or AsyncEngine.sync_engine) into stats.
+    """
+    # listeners go on the instance, class level pool listeners fail for asyncio pools
+    event.listen(engine, "connect", lambda *args: stats.add("connects"))
+    event.listen(engine, "checkout", lambda *args: stats.add("checked_out"))
+    event.listen(engine, "checkin", lambda *args: stats.add("checked_out", -1))
+    event.listen(engine, "invalidate", lambda *args: stats.add("invalidations"))
@@ -0,0 +1,298 @@
+import os
+import re
+import time
+import uuid
+import random
+import logging
+import cProfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# time, queries and rows of every request, in Server-Timing and /metrics/routes
+PROFILING = os.getenv("PROFILING", "true").lower() == "true"
+# log the statements a request runs PROFILE_N_PLUS_ONE_THRESHOLD times or more
+PROFILE_N_PLUS_ONE = os.getenv("PROFILE_N_PLUS_ONE", "false").lower() == "true"
+PROFILE_N_PLUS_ONE_THRESHOLD = int(os.getenv("PROFILE_N_PLUS_ONE_THRESHOLD", "5"))
+# run PROFILE_SAMPLE_RATE of the requests under cProfile and keep the profiles
+# of those slower than PROFILE_SLOW_MS in PROFILE_DIR (0 disables)
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.1"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+
+class RequestProfile:
+    """
+    What one request spent, filled by the engine events and serialization.
+    """
+
+    def __init__(self, track_statements: bool = False):
+        self.started = perf_counter()
+        self.queries = 0
+        self.rows = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        # executions per statement, only to find N+1 queries
+        self.statements = Counter() if track_statements else None
+
+    def server_timing(self) -> str:
+        elapsed = perf_counter() - self.started
+        return ", ".join(
+            [
+                f"app;dur={elapsed * 1000:.1f}",
+                # no commas in desc, they separate the metrics of the header
+                f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries/'
+                f'{self.rows} rows"',
+                f"serialize;dur={self.serialize_time * 1000:.1f}",
+            ]
+        )
+
+    def repeated_statements(self, threshold: int) -> dict[str, int]:
+        if self.statements is None:
+            return {}
+        return {
+            statement: count
+            for statement, count in self.statements.items()
+            if count >= threshold
+        }
+
+
+# the profile of the request being served, None outside requests
+current_profile: ContextVar[RequestProfile | None] = ContextVar(
+    "current_profile", default=None
+)
+
+
+@contextmanager
+def measure_serialization():
+    """
+    Adds the time spent in the block to the serialize time of the request.
+    """
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        profile = current_profile.get()
+        if profile is not None:
+            profile.serialize_time += perf_counter() - start
+
+
+class CountingCursor:
+    """
+    Proxy of a DBAPI cursor that counts the rows fetched through it.
+    """
+
+    def __init__(self, cursor, profile: RequestProfile):
+        self._cursor = cursor
+        self._profile = profile
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._profile.rows += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._profile.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._profile.rows += len(rows)
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile.get() is not None:
+        conn.info.setdefault("profile_started", []).append(perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    started = conn.info.get("profile_started")
+    if profile is None or not started:
+        return
+    profile.db_time += perf_counter() - started.pop()
+    profile.queries += 1
+    if profile.statements is not None:
+        profile.statements[statement] += 1
+    if cursor.description is not None:
+        # the result is built from context.cursor right after this event
+        context.cursor = CountingCursor(cursor, profile)
+
+
+def watch_queries(engine):
+    """
+    Counts the statements, rows and DB time of a sync engine (or
+    AsyncEngine.sync_engine) into the profile of the current request.
+    """
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+
+
+class RouteStats:
+    """
+    Totals of the profiles of each route since startup, shown by GET /metrics/routes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes: dict[str, dict] = {}
+
+    def record(self, route: str, profile: RequestProfile, elapsed: float, n_plus_one):
+        with self.lock:
+            totals = self.routes.setdefault(
+                route,
+                {
+                    "requests": 0,
+                    "time": 0.0,
+                    "max_time": 0.0,
+                    "db_time": 0.0,
+                    "serialize_time": 0.0,
+                    "queries": 0,
+                    "rows": 0,
+                    "n_plus_one": 0,
+                },
+            )
+            totals["requests"] += 1
+            totals["time"] += elapsed
+            totals["max_time"] = max(totals["max_time"], elapsed)
+            totals["db_time"] += profile.db_time
+            totals["serialize_time"] += profile.serialize_time
+            totals["queries"] += profile.queries
+            totals["rows"] += profile.rows
+            totals["n_plus_one"] += bool(n_plus_one)
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            - dict: Per route, the requests, the average and max time and the
+              average DB time, serialize time, queries and rows per request,
+              and the requests flagged for N+1 queries.
+        """
+        with self.lock:
+            return {
+                route: {
+                    "requests": t["requests"],
+                    "avg_ms": t["time"] / t["requests"] * 1000,
+                    "max_ms": t["max_time"] * 1000,
+                    "db_avg_ms": t["db_time"] / t["requests"] * 1000,
+                    "serialize_avg_ms": t["serialize_time"] / t["requests"] * 1000,
+                    "queries_avg": t["queries"] / t["requests"],
+                    "rows_avg": t["rows"] / t["requests"],
+                    "n_plus_one": t["n_plus_one"],
+                }
+                for route, t in sorted(self.routes.items())
+            }
+
+
+route_stats = RouteStats()
+
+# called with (route, profile) after every request, with the statements of
+# the profile tracked, e.g. by the query budget tests
+profile_observers: list = []
+
+# cProfile hooks the whole thread, only one request is sampled at a time
+_sampling_lock = threading.Lock()
+
+
+def start_sampling():
+    if PROFILE_SLOW_MS <= 0 or random.random() >= PROFILE_SAMPLE_RATE:
+        return None
+    if not _sampling_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def stop_sampling(profiler, route: str, elapsed: float):
+    """
+    Keeps the profile of a sampled request when it was slow. It covers the
+    event loop thread, so requests served meanwhile show up in it too, and
+    queries run in the threadpool are only in the db time.
+    """
+    profiler.disable()
+    _sampling_lock.release()
+    if elapsed * 1000 < PROFILE_SLOW_MS:
+        return
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = "{}-{}-{}.prof".format(
+        time.strftime("%Y%m%d-%H%M%S"),
+        re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_"),
+        uuid.uuid4().hex[:8],
+    )
+    path = os.path.join(PROFILE_DIR, name)
+    profiler.dump_stats(path)
+    logger.warning("%s took %.0f ms, profile saved to %s", route, elapsed * 1000, path)
+
+
+def route_label(scope) -> str:
+    # FastAPI puts the matched route in the scope, its path is the template
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return f"{scope['method']} {path}" if path else "unmatched"
+
+
+class ProfilingMiddleware:
+    """
+    Profiles every HTTP request: wall time, DB time, queries and rows
+    fetched, and serialization time. They're sent in a Server-Timing header
+    and added to route_stats.
+
+    With PROFILE_N_PLUS_ONE, statements a request repeats are logged. With
+    PROFILE_SLOW_MS, sampled slow requests are saved as cProfile dumps.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not PROFILING:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(
+            track_statements=PROFILE_N_PLUS_ONE or bool(profile_observers)
+        )
+        token = current_profile.set(profile)
+        profiler = start_sampling()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(
+                    "Server-Timing", profile.server_timing()
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_profile.reset(token)
+            elapsed = perf_counter() - profile.started
+            route = route_label(scope)
+            if profiler is not None:
+                stop_sampling(profiler, route, elapsed)
+            repeated = {}
+            if PROFILE_N_PLUS_ONE:
+                repeated = profile.repeated_statements(PROFILE_N_PLUS_ONE_THRESHOLD)
+            for statement, count in repeated.items():
+                logger.warning(
+                    "possible N+1 in %s, ran %d times: %s", route, count, statement
+                )
+            route_stats.record(route, profile, elapsed, repeated)
+            for observer in profile_observers:
+                observer(route, profile)
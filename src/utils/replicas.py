@@ -0,0 +1,166 @@
+import time
+import threading
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.concurrency import run_in_threadpool
+from src.utils.cache import (
+    CACHE_BACKEND,
+    CACHE_MAX_ENTRIES,
+    CACHE_REDIS_URL,
+    MemoryBackend,
+    RedisBackend,
+)
+
+
+def ping(bound):
+    with bound.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+async def is_healthy(bound) -> bool:
+    """
+    Returns whether a connection of the engine (sync or async) answers SELECT 1.
+    """
+    try:
+        if isinstance(bound, AsyncEngine):
+            async with bound.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+        else:
+            await run_in_threadpool(ping, bound)
+    except (SQLAlchemyError, OSError):
+        return False
+    return True
+
+
+class ReplicaRouter:
+    """
+    Chooses the engine of read-only sessions among read replicas.
+
+    Replicas are used in turn. One whose connection fails is left out for
+    retry_seconds, then health checked by the next read it would get. Users
+    who wrote in the last sticky_seconds read from the primary, so they see
+    their writes before the replicas catch up.
+
+    Parameters:
+        - replicas (list): Engines (or AsyncEngines) of the replicas.
+        - marks: A cache backend (get/set with ttl) remembering recent writers.
+    """
+
+    def __init__(
+        self, replicas: list, marks, sticky_seconds: int, retry_seconds: float
+    ):
+        self.replicas = replicas
+        self.marks = marks
+        self.sticky_seconds = sticky_seconds
+        self.retry_seconds = retry_seconds
+        self.lock = threading.Lock()
+        self.turn = 0
+        # index of a failed replica -> when it's health checked again
+        self.down_until: dict[int, float] = {}
+        self.reads = [0] * len(replicas)
+        self.primary_reads = 0
+        self.sticky_reads = 0
+        self.failovers = 0
+        for index, bound in enumerate(replicas):
+            self.watch(index, getattr(bound, "sync_engine", bound))
+
+    def watch(self, index: int, bound):
+        def handle_error(context):
+            # no connection: connecting failed, is_disconnect: it was lost
+            if context.connection is None or context.is_disconnect:
+                self.mark_down(index)
+
+        event.listen(bound, "handle_error", handle_error)
+
+    def mark_down(self, index: int):
+        with self.lock:
+            if index not in self.down_until:
+                self.failovers += 1
+            self.down_until[index] = time.monotonic() + self.retry_seconds
+
+    def mark_key(self, user_id: str) -> str:
+        return f"wrote:{user_id}"
+
+    async def wrote(self, user_id: str):
+        """
+        Keeps the reads of the user on the primary for sticky_seconds.
+        """
+        if not self.replicas or self.sticky_seconds <= 0:
+            return
+        key = self.mark_key(user_id)
+        if self.marks.blocking:
+            await run_in_threadpool(self.marks.set, key, b"1", self.sticky_seconds)
+        else:
+            self.marks.set(key, b"1", self.sticky_seconds)
+
+    async def recently_wrote(self, user_id: str) -> bool:
+        if self.sticky_seconds <= 0:
+            return False
+        key = self.mark_key(user_id)
+        if self.marks.blocking:
+            return await run_in_threadpool(self.marks.get, key) is not None
+        return self.marks.get(key) is not None
+
+    async def check(self, index: int) -> bool:
+        healthy = await is_healthy(self.replicas[index])
+        if healthy:
+            with self.lock:
+                self.down_until.pop(index, None)
+        return healthy
+
+    async def choose(self, user_id: str):
+        """
+        Returns the replica engine the user's next read-only session uses,
+        or None for the primary.
+        """
+        if not self.replicas:
+            return None
+        if await self.recently_wrote(user_id):
+            with self.lock:
+                self.sticky_reads += 1
+            return None
+
+        for _ in range(len(self.replicas)):
+            with self.lock:
+                index = self.turn % len(self.replicas)
+                self.turn += 1
+                down_until = self.down_until.get(index)
+                due = down_until is not None and down_until <= time.monotonic()
+                if due:
+                    # this read health checks it, the others keep skipping it
+                    self.down_until[index] = time.monotonic() + self.retry_seconds
+            if down_until is None or (due and await self.check(index)):
+                with self.lock:
+                    self.reads[index] += 1
+                return self.replicas[index]
+
+        with self.lock:
+            self.primary_reads += 1
+        return None
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "replicas": [
+                    {"reads": reads, "healthy": index not in self.down_until}
+                    for index, reads in enumerate(self.reads)
+                ],
+                "primary_reads": self.primary_reads,
+                "sticky_reads": self.sticky_reads,
+                "failovers": self.failovers,
+            }
+
+
+def create_write_marks():
+    """
+    Where the last write of each user is remembered: Redis with the redis
+    cache backend, so every worker keeps the user on the primary, else the
+    memory of the process.
+    """
+    if CACHE_BACKEND == "redis":
+        # optional dependency, only needed with this backend
+        import redis
+
+        return RedisBackend(redis.Redis.from_url(CACHE_REDIS_URL))
+    return MemoryBackend(CACHE_MAX_ENTRIES)
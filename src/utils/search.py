@@ -0,0 +1,117 @@
+from sqlalchemy import case, column, func, select, table, text
+from sqlalchemy.orm import Session
+from db import Task
+
+# trigram indexes can only match queries of at least this many characters
+TRIGRAM_LENGTH = 3
+
+# the FTS5 table of SQLite, it isn't mapped as it's created by create_search_index
+task_search = table("TaskSearch", column("id"), column("title"), column("rank"))
+
+
+def create_search_index(connection):
+    """
+    Creates the task title search index of the database of connection:
+    a pg_trgm GIN index on Postgres, an FTS5 trigram table kept in sync by
+    triggers on SQLite. Other databases search with LIKE.
+    """
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        connection.execute(
+            text(
+                'CREATE INDEX IF NOT EXISTS "ix_Task_title_trgm" '
+                'ON "Task" USING gin (title gin_trgm_ops)'
+            )
+        )
+    elif dialect == "sqlite":
+        drop_search_index(connection)
+        # titles are stored with the id of their task: Task's rowid is implicit
+        # and VACUUM may renumber it. TaskSearchKey numbers the ids so the
+        # triggers find the row of a task without scanning the FTS table.
+        for statement in (
+            'CREATE TABLE "TaskSearchKey" '
+            "(key INTEGER PRIMARY KEY, id VARCHAR(36) NOT NULL UNIQUE)",
+            'CREATE VIRTUAL TABLE "TaskSearch" USING fts5('
+            "id UNINDEXED, title, tokenize='trigram')",
+            'CREATE TRIGGER "Task_search_insert" AFTER INSERT ON "Task" BEGIN '
+            'INSERT INTO "TaskSearchKey"(id) VALUES (new.id); '
+            f'INSERT INTO "TaskSearch"(rowid, id, title) VALUES ({search_key("new")}, '
+            "new.id, new.title); END",
+            'CREATE TRIGGER "Task_search_delete" AFTER DELETE ON "Task" BEGIN '
+            f'DELETE FROM "TaskSearch" WHERE rowid = {search_key("old")}; '
+            'DELETE FROM "TaskSearchKey" WHERE id = old.id; END',
+            'CREATE TRIGGER "Task_search_update" AFTER UPDATE OF title ON "Task" '
+            f'BEGIN DELETE FROM "TaskSearch" WHERE rowid = {search_key("old")}; '
+            f'INSERT INTO "TaskSearch"(rowid, id, title) VALUES ({search_key("old")}, '
+            "new.id, new.title); END",
+            # index the tasks that existed before the table
+            'INSERT INTO "TaskSearchKey"(id) SELECT id FROM "Task"',
+            'INSERT INTO "TaskSearch"(rowid, id, title) SELECT key, "Task".id, title '
+            'FROM "Task" JOIN "TaskSearchKey" ON "TaskSearchKey".id = "Task".id',
+        ):
+            connection.execute(text(statement))
+
+
+def search_key(row: str) -> str:
+    # the TaskSearch rowid of the task of the trigger row ("new" or "old")
+    return f'(SELECT key FROM "TaskSearchKey" WHERE id = {row}.id)'
+
+
+def drop_search_index(connection):
+    """
+    Drops the SQLite search table, its keys and triggers, if they exist.
+    """
+    for statement in (
+        'DROP TRIGGER IF EXISTS "Task_search_insert"',
+        'DROP TRIGGER IF EXISTS "Task_search_delete"',
+        'DROP TRIGGER IF EXISTS "Task_search_update"',
+        'DROP TABLE IF EXISTS "TaskSearch"',
+        'DROP TABLE IF EXISTS "TaskSearchKey"',
+    ):
+        connection.execute(text(statement))
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_tasks(db_session: Session, user_id: str, query: str, limit: int):
+    """
+    Finds the user's tasks whose title contains query, case-insensitively.
+
+    Titles that start with query come first, then the best matches by the
+    ranking of the index (bm25 on SQLite, trigram similarity on Postgres).
+
+    Parameters:
+        - user_id (str): The owner of the tasks.
+        - query (str): The text to look for in titles.
+        - limit (int): The maximum number of tasks returned.
+
+    Returns:
+        - list[Task]: The matching tasks, best first.
+    """
+    dialect = db_session.get_bind().dialect.name
+    prefix = Task.title.ilike(escape_like(query) + "%", escape="\\")
+    is_prefix = case((prefix, 0), else_=1)
+    tasks = select(Task).where(Task.user_id == user_id).limit(limit)
+
+    if dialect == "sqlite" and len(query) >= TRIGRAM_LENGTH:
+        # an FTS5 phrase of the trigram tokenizer matches any substring
+        phrase = '"' + query.replace('"', '""') + '"'
+        tasks = (
+            tasks.join(task_search, task_search.c.id == Task.id)
+            .where(task_search.c.title.match(phrase))
+            .order_by(is_prefix, task_search.c.rank)
+        )
+    else:
+        # Postgres serves ILIKE '%...%' from the trigram index
+        tasks = tasks.where(
+            Task.title.ilike("%" + escape_like(query) + "%", escape="\\")
+        )
+        if dialect == "postgresql":
+            tasks = tasks.order_by(is_prefix, func.similarity(Task.title, query).desc())
+        else:
+            tasks = tasks.order_by(is_prefix, Task.title)
+
+    return list(db_session.scalars(tasks))
@@ -0,0 +1,68 @@
+from functools import lru_cache
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from src.utils.profiling import measure_serialization
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib encoder is used without it
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse encoded with orjson when it's installed. bytes content is
+    sent as is, it's JSON encoded already (e.g. by dump_list_json).
+
+    Routers opt in with default_response_class=FastJSONResponse.
+    """
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        with measure_serialization():
+            if orjson is None:
+                return super().render(content)
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+@lru_cache
+def list_adapter(model) -> TypeAdapter:
+    # building a TypeAdapter compiles a validator, keep one per model
+    return TypeAdapter(list[model])
+
+
+@lru_cache
+def model_columns(model, entity, required: tuple[str, ...] = ()) -> tuple:
+    """
+    Returns the columns of the mapped class entity that are fields of the
+    response model, to select rows instead of loading whole ORM objects.
+
+    Parameters:
+        - required (tuple[str, ...]): Columns selected even when they aren't
+          fields of model, e.g. the keys pagination or grouping needs.
+    """
+    table_columns = entity.__table__.columns
+    names = [name for name in model.model_fields if name in table_columns]
+    names += [name for name in required if name not in names]
+    return tuple(getattr(entity, name) for name in names)
+
+
+def dump_list_json(model, rows) -> bytes:
+    """
+    Encodes rows (ORM objects, selected rows or dicts) as the JSON of
+    list[model], the same body FastAPI would send for response_model=list[model].
+
+    The whole list is validated and encoded by pydantic-core in one call,
+    instead of model by model through jsonable_encoder.
+    """
+    adapter = list_adapter(model)
+    with measure_serialization():
+        return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+
+def list_response(model, rows, headers: dict | None = None) -> FastJSONResponse:
+    """
+    Returns the response of rows for an endpoint with response_model=list[model].
+    """
+    return FastJSONResponse(content=dump_list_json(model, rows), headers=headers)
@@ -0,0 +1,130 @@
+import os
+from collections import defaultdict
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from db import Task, TaskSummary, engine
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# maintain TaskSummary from the task writes and serve /stats from it
+STATS_SUMMARY = os.getenv("STATS_SUMMARY", "false").lower() == "true"
+
+# the columns tasks are grouped by in /stats
+DIMENSIONS = {
+    "project": Task.project_id,
+    "status": Task.status,
+    "priority": Task.priority,
+    "type": Task.type,
+}
+
+# the columns of a task that count in its summary rows
+SUMMARY_COLUMNS = [Task.user_id, Task.man_hour_min, *DIMENSIONS.values()]
+
+
+def summary_row(task) -> dict:
+    """
+    Returns the summary columns of a Task, a row mapping or a dict of values.
+    """
+    get = task.get if isinstance(task, dict) else lambda key: getattr(task, key)
+    return {column.key: get(column.key) for column in SUMMARY_COLUMNS}
+
+
+def get_summary_rows(db_session: Session, task_ids) -> list[dict]:
+    """
+    Reads the summary columns of tasks before they're changed or deleted,
+    only when they're needed.
+
+    The rows stay locked until the write commits: a concurrent write of the
+    same tasks waits, then reads the values this one left, so both don't
+    move the counters from the same old values. SQLite, which has one writer
+    at a time, doesn't render FOR UPDATE.
+    """
+    if not STATS_SUMMARY:
+        return []
+    rows = db_session.execute(
+        select(*SUMMARY_COLUMNS).where(Task.id.in_(task_ids)).with_for_update()
+    )
+    return [dict(row) for row in rows.mappings()]
+
+
+def apply_task_changes(db_session: Session, old_rows: list, new_rows: list):
+    """
+    Moves the TaskSummary counters from the old to the new version of tasks,
+    in the transaction of the write. Nothing is done unless STATS_SUMMARY.
+
+    Parameters:
+        - old_rows (list): The summary rows of the tasks before the write,
+          empty for inserts.
+        - new_rows (list): The summary rows after the write, empty for deletes.
+    """
+    if not STATS_SUMMARY:
+        return
+
+    deltas = defaultdict(lambda: [0, 0])
+    for sign, rows in ((-1, old_rows), (1, new_rows)):
+        # tasks without owner aren't in anyone's stats
+        for row in filter(lambda row: row["user_id"], rows):
+            for dimension, column in DIMENSIONS.items():
+                delta = deltas[row["user_id"], dimension, row[column.key] or ""]
+                delta[0] += sign
+                delta[1] += sign * (row["man_hour_min"] or 0)
+
+    values = [
+        {
+            "user_id": user_id,
+            "dimension": dimension,
+            "value": value,
+            "tasks": tasks,
+            "man_hour_min": man_hour_min,
+        }
+        for (user_id, dimension, value), (tasks, man_hour_min) in deltas.items()
+        if tasks or man_hour_min
+    ]
+    if not values:
+        return
+
+    # both dialects have INSERT ... ON CONFLICT DO UPDATE
+    dialect = db_session.get_bind().dialect.name
+    upsert = (postgresql if dialect == "postgresql" else sqlite).insert(TaskSummary)
+    db_session.execute(
+        upsert.on_conflict_do_update(
+            index_elements=["user_id", "dimension", "value"],
+            set_={
+                "tasks": TaskSummary.tasks + upsert.excluded.tasks,
+                "man_hour_min": TaskSummary.man_hour_min + upsert.excluded.man_hour_min,
+            },
+        ),
+        values,
+    )
+
+
+def rebuild_task_summaries(connection):
+    """
+    Recomputes every TaskSummary row from Task, e.g. after running with
+    STATS_SUMMARY off.
+    """
+    connection.execute(delete(TaskSummary))
+    for dimension, column in DIMENSIONS.items():
+        connection.execute(
+            insert(TaskSummary).from_select(
+                ["user_id", "dimension", "value", "tasks", "man_hour_min"],
+                select(
+                    Task.user_id,
+                    literal(dimension),
+                    func.coalesce(column, ""),
+                    func.count(),
+                    func.coalesce(func.sum(Task.man_hour_min), 0),
+                )
+                .where(Task.user_id.is_not(None))
+                .group_by(Task.user_id, func.coalesce(column, "")),
+            )
+        )
+
+
+# Run `python -m src.utils.stats` before turning STATS_SUMMARY on
+if __name__ == "__main__":
+    with engine.begin() as connection:
+        rebuild_task_summaries(connection)
+    print("task summaries rebuilt")
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+from src.utils.cache import MemoryBackend, RedisBackend, ResponseCache
+
+
+class FakeRedis:
+    # stands in for redis.Redis, only the calls RedisBackend makes
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def dbsize(self):
+        return len(self.data)
+
+
+def fetch(cache, user_id, namespace, params, body):
+    loads = []
+
+    async def load():
+        loads.append(body)
+        return body, {"X-Next-Cursor": "next"}
+
+    response = asyncio.run(cache.fetch(user_id, namespace, params, load))
+    return response, len(loads)
+
+
+def check_cache(cache):
+    response, loads = fetch(cache, "u1", "tasks", {"limit": 10}, b"[1]")
+    assert loads == 1
+    response, loads = fetch(cache, "u1", "tasks", {"limit": 10}, b"[2]")
+    assert loads == 0
+    assert response.body == b"[1]"
+    assert response.headers["X-Next-Cursor"] == "next"
+
+    # other queries and users have their own entries
+    assert fetch(cache, "u1", "tasks", {"limit": 20}, b"[]")[1] == 1
+    assert fetch(cache, "u2", "tasks", {"limit": 10}, b"[]")[1] == 1
+
+    # invalidation is per user and namespace
+    fetch(cache, "u1", "projects", {}, b"[]")
+    asyncio.run(cache.invalidate("u1", "tasks"))
+    assert fetch(cache, "u1", "tasks", {"limit": 10}, b"[3]")[0].body == b"[3]"
+    assert fetch(cache, "u2", "tasks", {"limit": 10}, b"[]")[1] == 0
+    assert fetch(cache, "u1", "projects", {}, b"[]")[1] == 0
+
+    stats = cache.stats()
+    assert stats["hits"] == 3
+    assert stats["misses"] == 5
+    assert stats["invalidations"] == 1
+
+
+def test_memory_cache():
+    check_cache(ResponseCache(MemoryBackend(100), ttl=60))
+
+
+def test_redis_cache():
+    check_cache(ResponseCache(RedisBackend(FakeRedis()), ttl=60))
+
+
+def test_redis_cache_writes_off_the_event_loop():
+    class ThreadsRedis(FakeRedis):
+        def set(self, key, value, ex=None, nx=False):
+            threads.add(threading.current_thread())
+            return super().set(key, value, ex, nx)
+
+    threads = set()
+    cache = ResponseCache(RedisBackend(ThreadsRedis()), ttl=60)
+    asyncio.run(cache.invalidate("u1", "tasks", "projects"))
+    assert threads and threading.main_thread() not in threads
+
+
+def test_memory_backend_expires_and_evicts():
+    backend = MemoryBackend(2)
+    backend.set("expired", b"x", ttl=-1)
+    assert backend.get("expired") is None
+    backend.set("a", b"a")
+    backend.set("b", b"b")
+    backend.get("a")
+    backend.set("c", b"c")
+    assert backend.get("b") is None
+    assert backend.get("a") == b"a"
@@ -0,0 +1,71 @@
+import uuid
+import asyncio
+import pytest
+from src.utils.events import Broker, TooManyStreams
+
+
+def test_events_reach_the_streams_of_their_user():
+    async def run():
+        broker = Broker(queue_size=10, max_streams=2)
+        mine = broker.subscribe("u1")
+        other = broker.subscribe("u2")
+        broker.publish("u1", "task", "created", ["t1"])
+        event = await mine.get(1)
+        assert (event["entity"], event["op"]) == ("task", "created")
+        assert event["ids"] == ["t1"]
+        assert await other.get(0.01) is None
+
+        broker.subscribe("u1")
+        with pytest.raises(TooManyStreams):
+            broker.subscribe("u1")
+        broker.unsubscribe(mine)
+        assert broker.can_subscribe("u1")
+
+    asyncio.run(run())
+
+
+def test_slow_stream_is_told_to_resync():
+    async def run():
+        broker = Broker(queue_size=2, max_streams=1)
+        subscription = broker.subscribe("u1")
+        for i in range(3):
+            broker.publish("u1", "task", "updated", [str(i)])
+        assert (await subscription.get(1))["op"] == "resync"
+        assert await subscription.get(0.01) is None
+        assert broker.stats()["dropped"] == 2
+
+    asyncio.run(run())
+
+
+class FakeSender:
+    # stands in for the asyncpg connection, rejects payloads as Postgres does
+    def __init__(self, broker: Broker):
+        self.broker = broker
+
+    async def execute(self, query, channel, payload):
+        if len(payload.encode()) >= 8000:
+            raise ValueError("payload string too long")
+        self.broker.on_notify(None, 0, channel, payload)
+
+
+def test_bulk_events_are_split_across_notifies():
+    async def run():
+        broker = Broker(queue_size=100, max_streams=1, dsn="postgresql://unused")
+        broker.sender = FakeSender(broker)
+        subscription = broker.subscribe("u1")
+        ids = [str(uuid.uuid4()) for _ in range(1000)]
+        broker.publish("u1", "task", "deleted", ids)
+        await asyncio.gather(*broker.pending)
+
+        received = []
+        while True:
+            event = await subscription.get(0.01)
+            if event is None:
+                break
+            assert event["op"] == "deleted"
+            received += event["ids"]
+        # several events, in order, with every id
+        assert received == ids
+        assert broker.stats()["dropped"] == 0
+
+    asyncio.run(run())
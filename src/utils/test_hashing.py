@@ -0,0 +1,50 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from src.utils.hashing import PasswordHasher
+
+
+def bcrypt_context(rounds):
+    return CryptContext(
+        schemes=["bcrypt"],
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+def test_verify_rehashes_when_cost_changes():
+    old_hash = bcrypt_context(4).hash("pw")
+    hasher = PasswordHasher(bcrypt_context(5), workers=1, queue_size=1)
+
+    valid, new_hash = asyncio.run(hasher.verify_and_update("pw", old_hash))
+    assert valid
+    assert new_hash and "$05$" in new_hash
+
+    valid, new_hash = asyncio.run(hasher.verify_and_update("pw", new_hash))
+    assert valid
+    assert new_hash is None
+
+    valid, _ = asyncio.run(hasher.verify_and_update("wrong", old_hash))
+    assert not valid
+
+
+def test_rejects_when_saturated():
+    hasher = PasswordHasher(bcrypt_context(4), workers=1, queue_size=0)
+    release = threading.Event()
+
+    async def scenario():
+        blocked = asyncio.ensure_future(hasher.run(release.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as error:
+            await hasher.hash("pw")
+        release.set()
+        await blocked
+        return error.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert hasher.stats()["rejected"] == 1
+    assert hasher.stats()["pending"] == 0
@@ -0,0 +1,44 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from db import Base, User
+from src.utils.persist import save, update_returning
+
+
+@pytest.fixture(params=[True, False], ids=["returning", "select-update"])
+def db_session(request):
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    engine.dialect.update_returning = request.param
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def test_writes_return_state_without_refetch(db_session):
+    now = datetime.now()
+    statements = []
+    event.listen(
+        db_session.get_bind(),
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+
+    user = save(
+        db_session,
+        User(id="1", username="a", email="a@b", created_at=now, updated_at=now),
+    )
+    assert user.username == "a"
+    assert len(statements) == 1
+
+    statements.clear()
+    user = update_returning(db_session, User, [User.id == "1"], {"username": "b"})
+    assert user.username == "b"
+    returning = db_session.get_bind().dialect.update_returning
+    # UPDATE ... RETURNING, or SELECT then UPDATE, and nothing after the commit
+    assert len(statements) == (1 if returning else 2)
+    assert statements[-1].startswith("UPDATE")
+
+    missing = update_returning(db_session, User, [User.id == "2"], {"username": "c"})
+    assert missing is None
@@ -0,0 +1,33 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from src.utils.pool import PoolStats, metered_pool_class, watch_pool_events
+
+
+def test_metered_pool_counts_checkouts_and_timeouts(tmp_path):
+    stats = PoolStats()
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/pool.db",
+        poolclass=metered_pool_class(QueuePool, stats),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    watch_pool_events(engine, stats)
+
+    connection = engine.connect()
+    snapshot = stats.snapshot(engine.pool)
+    assert snapshot["checked_out"] == 1
+    assert snapshot["idle"] == 0
+
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+    assert stats.timeouts == 1
+    assert stats.wait_max >= 0.05
+
+    connection.close()
+    snapshot = stats.snapshot(engine.pool)
+    assert snapshot["checked_out"] == 0
+    assert snapshot["idle"] == 1
+    assert snapshot["connects"] == 1
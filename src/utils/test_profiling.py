@@ -0,0 +1,55 @@
+import os
+from fastapi.testclient import TestClient
+from main import app
+from src.endpoints import metrics
+from src.utils import profiling
+from src.utils.profiling import RequestProfile
+
+client = TestClient(app)
+
+
+TASK_DATA = {
+    "title": "test",
+    "status": "todo",
+    "type": "mtg",
+    "man_hour_min": 30,
+    "to_date": "2023-08-14T15:32:00",
+    "from_date": "2023-08-14T15:32:00",
+    "priority": "high",
+    "project_id": "test",
+}
+
+
+def test_server_timing_and_route_metrics(new_user_headers, monkeypatch):
+    for i in range(2):
+        client.post("/tasks", headers=new_user_headers, json=TASK_DATA)
+
+    response = client.get("/tasks?limit=10", headers=new_user_headers)
+    entries = response.headers["Server-Timing"].split(",")
+    timing = dict(entry.strip().split(";", 1) for entry in entries)
+    assert set(timing) == {"app", "db", "serialize"}
+    # the version query, then the page of two tasks
+    assert 'desc="2 queries/3 rows"' in timing["db"]
+
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "secret")
+    headers = {"Authorization": "Bearer secret"}
+    routes = client.get("/metrics/routes", headers=headers).json()
+    assert routes["GET /tasks"]["requests"] >= 1
+    assert routes["POST /tasks"]["queries_avg"] > 0
+
+
+def test_repeated_statements():
+    profile = RequestProfile(track_statements=True)
+    profile.statements.update(["SELECT a"] * 5 + ["SELECT b"] * 2)
+    assert profile.repeated_statements(5) == {"SELECT a": 5}
+    assert RequestProfile().repeated_statements(1) == {}
+
+
+def test_slow_requests_are_profiled(new_user_headers, monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_SLOW_MS", 0.001)
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+
+    client.get("/tasks", headers=new_user_headers)
+    (name,) = os.listdir(tmp_path)
+    assert "GET_tasks" in name and name.endswith(".prof")
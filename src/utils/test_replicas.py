@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from src.utils.cache import MemoryBackend
+from src.utils.replicas import ReplicaRouter, is_healthy
+
+
+def choose(router, user_id: str, reads: int = 1) -> list:
+    async def run():
+        return [await router.choose(user_id) for _ in range(reads)]
+
+    return asyncio.run(run())
+
+
+def test_reads_rotate_and_skip_failed_replicas(tmp_path):
+    good = create_engine(f"sqlite:///{tmp_path / 'good.db'}")
+    missing = tmp_path / "missing"
+    bad = create_engine(f"sqlite:///{missing / 'replica.db'}")
+    # retry_seconds 0: a failed replica is health checked again by the next read
+    router = ReplicaRouter([good, bad], MemoryBackend(100), 5, 0)
+
+    assert choose(router, "u1", 2) == [good, bad]
+    with pytest.raises(OperationalError):
+        bad.connect()
+    assert router.stats()["failovers"] == 1
+
+    # the health check of bad fails, its read goes to good
+    assert choose(router, "u1", 2) == [good, good]
+    assert router.stats()["replicas"][1]["healthy"] is False
+
+    # once it connects again it's back in turn
+    missing.mkdir()
+    assert choose(router, "u1", 2) == [bad, good]
+    assert router.stats()["replicas"][1]["healthy"] is True
+
+
+def test_writers_read_from_the_primary(tmp_path):
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    router = ReplicaRouter([replica], MemoryBackend(100), 5, 30)
+
+    asyncio.run(router.wrote("u1"))
+    assert choose(router, "u1") == [None]
+    assert choose(router, "u2") == [replica]
+    assert router.stats()["sticky_reads"] == 1
+
+    # without replicas everything reads from the primary
+    assert choose(ReplicaRouter([], MemoryBackend(100), 5, 30), "u1") == [None]
+
+
+def test_blocking_marks_are_used_off_the_event_loop(tmp_path):
+    # like RedisBackend, the marks of the redis cache backend
+    class BlockingMarks(MemoryBackend):
+        blocking = True
+
+        def get(self, key):
+            threads.add(threading.current_thread())
+            return super().get(key)
+
+        def set(self, key, value, ttl=None, nx=False):
+            threads.add(threading.current_thread())
+            return super().set(key, value, ttl, nx)
+
+    threads = set()
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    router = ReplicaRouter([replica], BlockingMarks(100), 5, 30)
+    asyncio.run(router.wrote("u1"))
+    assert choose(router, "u1") == [None]
+    assert threads and threading.main_thread() not in threads
+
+
+def test_is_healthy(tmp_path):
+    async def run():
+        return [
+            await is_healthy(create_engine(f"sqlite:///{tmp_path / 'a.db'}")),
+            await is_healthy(
+                create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'b.db'}")
+            ),
+            await is_healthy(create_engine(f"sqlite:///{tmp_path / 'no' / 'c.db'}")),
+        ]
+
+    assert asyncio.run(run()) == [True, True, False]
@@ -0,0 +1,43 @@
+from datetime import datetime
+from sqlalchemy import create_engine, delete, insert, text, update
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from db import Task
+from migrations import run_migrations
+from src.utils.search import search_tasks
+
+
+def add_tasks(connection, *titles):
+    now = datetime.now()
+    for title in titles:
+        connection.execute(
+            insert(Task).values(
+                id=f"task-{title}",
+                title=title,
+                user_id="u1",
+                to_date=now,
+                from_date=now,
+                created_at=now,
+                updated_at=now,
+            )
+        )
+
+
+def test_search_index_follows_tasks_when_rowids_change():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    run_migrations(engine)
+    with engine.begin() as connection:
+        add_tasks(connection, "Write report", "Deploy", "Review the report")
+        connection.execute(delete(Task).where(Task.title == "Deploy"))
+    with engine.begin() as connection:
+        # what VACUUM may do to the implicit rowids of Task
+        connection.execute(text('UPDATE "Task" SET rowid = rowid + 100'))
+        add_tasks(connection, "Report bugs")
+        connection.execute(
+            update(Task).where(Task.title == "Write report").values(title="Write docs")
+        )
+
+    with Session(engine) as session:
+        titles = [t.title for t in search_tasks(session, "u1", "report", 10)]
+        assert titles == ["Report bugs", "Review the report"]
+        assert search_tasks(session, "u1", "docs", 10)[0].id == "task-Write report"
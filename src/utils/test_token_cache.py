@@ -0,0 +1,38 @@
+import time
+from src.utils.token_cache import TokenCache
+
+
+def test_cache_hits_until_exp():
+    cache = TokenCache(maxsize=10, ttl=60)
+    assert cache.get("token") is None
+    cache.put("token", {"id": "1"}, time.time() + 60)
+    assert cache.get("token") == {"id": "1"}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+    # an entry never outlives the exp of its token
+    cache.put("expired", {"id": "2"}, time.time() - 1)
+    assert cache.get("expired") is None
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TokenCache(maxsize=2, ttl=60)
+    exp = time.time() + 60
+    cache.put("a", {"id": "a"}, exp)
+    cache.put("b", {"id": "b"}, exp)
+    cache.get("a")
+    cache.put("c", {"id": "c"}, exp)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_revoked_token_is_not_served():
+    cache = TokenCache(maxsize=10, ttl=60)
+    exp = time.time() + 60
+    cache.put("token", {"id": "1"}, exp)
+    cache.revoke("token", exp)
+    assert cache.is_revoked("token")
+    assert cache.get("token") is None
+    cache.put("token", {"id": "1"}, exp)
+    assert cache.get("token") is None
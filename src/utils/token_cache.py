@@ -0,0 +1,94 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenCache:
+    """
+    Bounded LRU of verified JWT claims, keyed by a SHA-256 of the token.
+
+    An entry lives for ttl seconds at most and never past the token's exp,
+    so a cached token expires exactly when the JWT itself would. Revoked
+    tokens are refused until their exp, whether cached or not.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        # token hash -> (claims, expires at)
+        self.entries: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        # token hash -> exp of the revoked token
+        self.revoked: dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token: str) -> str:
+        # tokens are never kept in memory as is
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> dict | None:
+        """
+        Returns the cached claims of token, or None on a miss.
+        """
+        key = self.key(token)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] <= now or key in self.revoked:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, claims: dict, exp: float):
+        """
+        Caches the claims of a verified token.
+
+        Parameters:
+            - token (str): The raw JWT.
+            - claims (dict): What get_current_user returns for it.
+            - exp (float): The exp claim of the token as a unix timestamp.
+        """
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        key = self.key(token)
+        with self.lock:
+            self.entries[key] = (claims, min(exp, time.time() + self.ttl))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def revoke(self, token: str, exp: float):
+        """
+        Refuses token until exp, after which the JWT is rejected anyway.
+        """
+        key = self.key(token)
+        now = time.time()
+        with self.lock:
+            self.entries.pop(key, None)
+            # forget revocations of tokens that have expired since
+            for revoked_key in [k for k, e in self.revoked.items() if e <= now]:
+                del self.revoked[revoked_key]
+            self.revoked[key] = exp
+
+    def is_revoked(self, token: str) -> bool:
+        with self.lock:
+            return self.key(token) in self.revoked
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "revoked": len(self.revoked),
+            }
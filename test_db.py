@@ -0,0 +1,36 @@
+from fastapi.testclient import TestClient
+from starlette import status
+from db import POOL_STATS, to_async_url
+from main import app
+
+client = TestClient(app)
+
+
+def test_to_async_url():
+    assert (
+        to_async_url("postgresql://user:pw@host:5432/app").render_as_string(False)
+        == "postgresql+asyncpg://user:pw@host:5432/app"
+    )
+    assert str(to_async_url("postgresql+psycopg2://host/app")) == (
+        "postgresql+asyncpg://host/app"
+    )
+    assert str(to_async_url("sqlite:////tmp/app.db")) == "sqlite+aiosqlite:////tmp/app.db"
+
+
+def test_requests_without_db_work_dont_check_out_connections():
+    stats = next(iter(POOL_STATS.values()))
+    checkouts = stats.checkouts
+
+    assert client.get("/docs").status_code == status.HTTP_200_OK
+    preflight = client.options(
+        "/tasks",
+        headers={
+            "Origin": "http://localhost:3000",
+            "Access-Control-Request-Method": "GET",
+        },
+    )
+    assert preflight.status_code == status.HTTP_200_OK
+    assert client.get("/tasks").status_code == status.HTTP_401_UNAUTHORIZED
+
+    assert stats.checkouts == checkouts
+    assert stats.checked_out == 0
@@ -0,0 +1,61 @@
+import json
+import asyncio
+import pytest
+from starlette import status
+import lambda_handler
+from routes.api import ROUTERS
+
+
+def http_api_event(method: str, path: str) -> dict:
+    # the event API Gateway HTTP APIs (payload 2.0) send to the function
+    return {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": path,
+        "rawQueryString": "",
+        "headers": {"host": "example.com"},
+        "requestContext": {
+            "http": {
+                "method": method,
+                "path": path,
+                "protocol": "HTTP/1.1",
+                "sourceIp": "127.0.0.1",
+                "userAgent": "pytest",
+            },
+        },
+        "isBase64Encoded": False,
+    }
+
+
+@pytest.fixture
+def main_thread_loop():
+    # Mangum runs on the loop of the main thread, other tests may have closed it
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop
+    asyncio.set_event_loop(None)
+    loop.close()
+
+
+def test_routers_are_included_as_requested(main_thread_loop, capsys):
+    response = lambda_handler.handler(http_api_event("GET", "/tasks"), None)
+    assert response["statusCode"] == status.HTTP_401_UNAUTHORIZED
+    assert lambda_handler.included == {"tasks"}
+
+    # the first invocation reports the cold start, later ones don't
+    report = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert set(report["cold_start"]) == {
+        "import_framework_ms",
+        "import_db_ms",
+        "import_app_ms",
+        "create_app_ms",
+        "routers_ms",
+        "first_request_ms",
+        "total_ms",
+    }
+
+    response = lambda_handler.handler(http_api_event("GET", "/openapi.json"), None)
+    assert response["statusCode"] == status.HTTP_200_OK
+    assert lambda_handler.included == set(ROUTERS)
+    assert "/projects/tasks" in json.loads(response["body"])["paths"]
+    assert "cold_start" not in capsys.readouterr().out
@@ -0,0 +1,37 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import StaticPool
+from migrations import MIGRATIONS, run_migrations
+
+
+def memory_engine():
+    return create_engine("sqlite://", poolclass=StaticPool)
+
+
+def test_migrate_empty_database():
+    engine = memory_engine()
+    assert run_migrations(engine) == sorted(version for version, _, _ in MIGRATIONS)
+
+    indexes = {i["name"]: i for i in inspect(engine).get_indexes("Task")}
+    assert "ix_Task_project_id" in indexes
+    assert "ix_Task_user_id_title" in indexes
+    # running again is a no-op
+    assert run_migrations(engine) == []
+
+
+def test_migrate_database_created_before_runner():
+    engine = memory_engine()
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                'CREATE TABLE "User" (id VARCHAR(36) PRIMARY KEY, '
+                "username VARCHAR(100), email VARCHAR(100), password VARCHAR(100), "
+                "created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL)"
+            )
+        )
+        connection.execute(text('CREATE INDEX "ix_User_username" ON "User" (username)'))
+
+    run_migrations(engine)
+
+    indexes = {i["name"]: i for i in inspect(engine).get_indexes("User")}
+    assert indexes["ix_User_username"]["unique"]
+    assert "Task" in inspect(engine).get_table_names()
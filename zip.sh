@@ -1,8 +1,12 @@
-pip install -t ./lib -r requirements.txt 
+pip install -t ./lib -r requirements.txt
 cd lib
-zip ../lambda_function.zip ./*
+zip -r ../lambda_function.zip .
 cd ..
-zip lambda_function.zip -u main.py 
+# handler: lambda_handler.handler, run `python migrations.py` on each deploy
+zip lambda_function.zip -u lambda_handler.py
+zip lambda_function.zip -u main.py
+zip lambda_function.zip -u db.py
+zip lambda_function.zip -u migrations.py
 zip lambda_function.zip -u __init__.py
 zip lambda_function.zip -ur src
 zip lambda_function.zip -ur routes